@@ -6,6 +6,8 @@ from bokeh.layouts import row, column, Spacer
 from bokeh.palettes import Category10, Category20
 from bokeh.io import output_file
 
+from unique_counts import grouped_unique_counts
+
 import sqlite3
 import pandas as pd
 
@@ -21,19 +23,10 @@ def load_data_from_sqlite(db_name='src/alchemy_data.db'):
     conn.close()
     
     # Calculate cumulative unique entropy per series
-    df['unique_entropy'] = df.groupby('time_series_number')['lambda_expression'].transform(cumulative_unique_counts)
+    df['unique_entropy'] = grouped_unique_counts(df, 'time_series_number', 'lambda_expression')
     
     return df
 
-# Function to calculate cumulative unique counts
-def cumulative_unique_counts(x):
-    seen = set()
-    counts = []
-    for item in x:
-        seen.add(item)
-        counts.append(len(seen))
-    return counts
-
 # Load data from SQLite database
 df = load_data_from_sqlite()
 
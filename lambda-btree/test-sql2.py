@@ -1,37 +1,26 @@
-import sqlite3
-import pandas as pd
+import os
+import sys
 from bokeh.models import ColumnDataSource, Select, Div, CustomJS
 from bokeh.plotting import figure, show
 from bokeh.layouts import row, column, Spacer
 from bokeh.palettes import Category10, Category20
 from bokeh.io import output_file
 
+from unique_counts import grouped_unique_counts
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from alchemy_store import AlchemyStore
+
 # Load data from SQLite and compute unique entropy per series
 def load_data_from_sqlite(db_name='src/alchemy_data.db'):
-    conn = sqlite3.connect(db_name)
-    
-    query = """
-    SELECT experiment_id, series_number, lambda_expression, 
-           ROW_NUMBER() OVER(PARTITION BY experiment_id, series_number ORDER BY id) AS time_step
-    FROM alchemy_data
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    with AlchemyStore(db_name) as store:
+        df = store.read_frame()
     
     # Calculate cumulative unique entropy per series
-    df['unique_entropy'] = df.groupby(['experiment_id', 'series_number'])['lambda_expression'].transform(cumulative_unique_counts)
+    df['unique_entropy'] = grouped_unique_counts(df, ['experiment_id', 'series_number'], 'lambda_expression')
     
     return df
 
-# Helper function to calculate cumulative unique counts for entropy
-def cumulative_unique_counts(x):
-    seen = set()
-    counts = []
-    for item in x:
-        seen.add(item)
-        counts.append(len(seen))
-    return counts
-
 # Load data from SQLite database
 df = load_data_from_sqlite()
 
@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Cumulative distinct counts ("unique entropy") for very long series without
+# keeping every expression string in a Python set. Expressions are hashed
+# once to 64 bits (vectorized, pandas' hash_array); the hashes then feed
+#
+#   mode="hll"    HyperLogLog, 2**p one-byte registers per series, relative
+#                 standard error about 1.04 / sqrt(2**p), or
+#   mode="exact"  a sorted NumPy array of the distinct 64-bit hashes (exact
+#                 up to hash collisions, 8 bytes per distinct expression).
+#
+# Both produce the whole per-row curve with array operations, chunk by
+# chunk, so a series can also be streamed from the database.
+
+U64 = np.uint64
+
+
+def hash_expressions(values) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def precision_for_error(error: float) -> int:
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(p, 4), 18)
+
+
+def _bit_length(v: np.ndarray) -> np.ndarray:
+    v = v.copy()
+    n = np.zeros(v.shape, dtype=np.int64)
+    for s in (32, 16, 8, 4, 2, 1):
+        big = v >= (U64(1) << U64(s))
+        n[big] += s
+        v[big] >>= U64(s)
+    return n + (v > 0)
+
+
+class UniqueCounter:
+    def __init__(self, mode: str = "hll", error: float = 0.01, precision: int | None = None):
+        if mode not in ("hll", "exact"):
+            raise ValueError(f"unknown mode {mode!r}")
+        self.mode = mode
+        self.rows = 0
+        if mode == "exact":
+            self.seen = np.empty(0, dtype=U64)
+            self.exact_count = 0
+        else:
+            self.p = precision if precision is not None else precision_for_error(error)
+            self.m = 1 << self.p
+            self.registers = np.zeros(self.m, dtype=np.uint8)
+            self.inv_sum = float(self.m)  # sum of 2**-register
+            self.zeros = self.m
+            self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    @property
+    def relative_error(self) -> float:
+        return 0.0 if self.mode == "exact" else 1.04 / math.sqrt(self.m)
+
+    def update(self, values) -> np.ndarray:
+        # Cumulative distinct count after each row of this chunk, continuing
+        # from earlier chunks. Accepts strings or precomputed uint64 hashes.
+        values = np.asarray(values)
+        hashes = values if values.dtype == U64 else hash_expressions(values)
+        if len(hashes) == 0:
+            return np.empty(0)
+        if self.mode == "exact":
+            counts = self._update_exact(hashes)
+        else:
+            counts = self._update_hll(hashes)
+        self.rows += len(hashes)
+        return counts
+
+    def count(self) -> float:
+        if self.mode == "exact":
+            return float(self.exact_count)
+        return float(self._estimate(np.array([self.inv_sum]), np.array([self.zeros]))[0])
+
+    def _update_exact(self, hashes: np.ndarray) -> np.ndarray:
+        uniq, first = np.unique(hashes, return_index=True)
+        pos = np.searchsorted(self.seen, uniq)
+        known = (pos < len(self.seen)) & (self.seen[np.minimum(pos, len(self.seen) - 1)] == uniq) \
+            if len(self.seen) else np.zeros(len(uniq), dtype=bool)
+        is_new = np.zeros(len(hashes), dtype=np.int64)
+        is_new[first[~known]] = 1
+        counts = self.exact_count + np.cumsum(is_new)
+        self.seen = np.union1d(self.seen, uniq[~known])
+        self.exact_count = int(counts[-1])
+        return counts.astype(float)
+
+    def _update_hll(self, hashes: np.ndarray) -> np.ndarray:
+        p = self.p
+        idx = (hashes >> U64(64 - p)).astype(np.int64)
+        rest = hashes & ((U64(1) << U64(64 - p)) - U64(1))
+        rho = (64 - p) - _bit_length(rest) + 1
+
+        # Running max of each register along the chunk: sort rows by
+        # register (stable, so row order is kept inside a register) and
+        # take a cumulative max of register * 128 + rho.
+        order = np.argsort(idx, kind="stable")
+        g = idx[order]
+        start = self.registers[g].astype(np.int64)
+        keyed = np.maximum(g * 128 + rho[order], g * 128 + start)
+        cm = np.maximum.accumulate(keyed) - g * 128
+        prev = np.empty_like(cm)
+        prev[1:] = cm[:-1]
+        first = np.ones(len(g), dtype=bool)
+        first[1:] = g[1:] != g[:-1]
+        prev[first] = start[first]
+
+        changed = cm > prev
+        d_sum = np.zeros(len(g))
+        d_sum[changed] = np.exp2(-cm[changed].astype(float)) - np.exp2(-prev[changed].astype(float))
+        d_zero = (changed & (prev == 0)).astype(np.int64)
+
+        row_sum = np.empty(len(g))
+        row_sum[order] = d_sum
+        row_zero = np.empty(len(g), dtype=np.int64)
+        row_zero[order] = d_zero
+        sums = self.inv_sum + np.cumsum(row_sum)
+        zeros = self.zeros - np.cumsum(row_zero)
+
+        np.maximum.at(self.registers, idx, rho.astype(np.uint8))
+        self.inv_sum = float(sums[-1])
+        self.zeros = int(zeros[-1])
+
+        est = self._estimate(sums, zeros)
+        # An estimate can never exceed the rows seen, and the curve should
+        # not go down when the estimator switches regimes.
+        est = np.minimum(est, self.rows + np.arange(1, len(est) + 1))
+        return np.maximum.accumulate(est)
+
+    def _estimate(self, sums: np.ndarray, zeros: np.ndarray) -> np.ndarray:
+        m = self.m
+        raw = self.alpha * m * m / sums
+        with np.errstate(divide="ignore"):
+            linear = m * np.log(m / np.maximum(zeros, 1))
+        # Linear counting stays more accurate than raw HLL well past the
+        # classic 2.5 m switch point; 5 m avoids most of raw HLL's bias bump.
+        return np.where((raw <= 5 * m) & (zeros > 0), linear, raw)
+
+
+def cumulative_unique_counts(x, mode: str = "hll", error: float = 0.01) -> np.ndarray:
+    # Drop-in for the dashboards' groupby(...)[col].transform(...).
+    return UniqueCounter(mode, error).update(x)
+
+
+def grouped_unique_counts(df: pd.DataFrame, by, column: str = "lambda_expression",
+                          mode: str = "hll", error: float = 0.01) -> pd.Series:
+    # Hashes the whole column once, then counts per group in row order.
+    hashes = pd.Series(hash_expressions(df[column].to_numpy()), index=df.index)
+    return hashes.groupby([df[b] for b in ([by] if isinstance(by, str) else by)]) \
+        .transform(lambda h: UniqueCounter(mode, error).update(h.to_numpy()))
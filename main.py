@@ -1,26 +1,21 @@
-from src.btree_generator import BtreeGen
-from src.fontana_generator import FontanaGen
-from src.lambda_parse import LambdaLexer, LambdaParser
+import argparse
+import os
+import sys
 
-from ete3 import Tree, TreeStyle, CircleFace, TextFace, AttrFace, faces
-
-
-def my_layout(node):
-    print(node.name)
-    if node.is_leaf():
-        name_face = AttrFace("name")  # draw name for leaves
-    else:  # internal node
-        if node.name == "":
-            name_face = CircleFace(5, "red")
-        else:
-            name_face = AttrFace("name", fsize=10)  # draw label with small font
-
-    # Add the name face to the image at the preferred position
-    faces.add_face_to_node(name_face, node, column=0)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
 
+from btree_generator import BtreeGen
+from fontana_generator import FontanaGen
+from lambda_parse import LambdaLexer, LambdaParser
+from lambda_svg import write_svg
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Render a few random trees to SVG.")
+    parser.add_argument("--backend", choices=["svg", "ete3"], default="svg",
+                        help="svg is built in; ete3 needs requirements-extras.txt")
+    args = parser.parse_args()
+
     NODES = 20
     MAX_FREE_VARIABLES = 10
     EXPRESSIONS = 10
@@ -34,17 +29,13 @@ def main():
             parser = LambdaParser(lexer)
 
             ast = parser.parse()
-            t = ast.to_ete3()
-            ts = TreeStyle()
-            ts.show_leaf_name = False
-            ts.layout_fn = my_layout
-            ts.show_scale = False
-            #  ts.mode = 'c'
-            #  ts.arc_start = -180 # 0 degrees = 3 o'clock
-            #  ts.arc_span = 180
-            #  ts.force_topology = True
-            t.render(f"tree_{gix}_{i}.svg", tree_style=ts, w=512, units='px')
-            print(t.get_ascii(show_internal=True))
+            if args.backend == "ete3":
+                from lambda_render import render_ete3
+                t = render_ete3(ast, f"tree_{gix}_{i}.svg")
+                print(t.get_ascii(show_internal=True))
+            else:
+                write_svg(ast, f"tree_{gix}_{i}.svg")
+                ast.write_ascii(sys.stdout)
 
     #
     #  for i in range(EXPRESSIONS):
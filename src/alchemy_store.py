@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import contextlib
+import queue
+import sqlite3
+from dataclasses import dataclass
+
+from lambda_ast import ASTNode
+from lambda_canon import canonical_hash
+from parse_cache import parse_expression
+
+# Data access for the alchemy_data table. Writers store a precomputed
+# time_step (position within the series) and canonical_hash per row, and
+# covering indexes let readers filter by experiment, series, time step or
+# canonical hash without the ROW_NUMBER() scan the dashboards used to run.
+#
+# Readers go through AlchemyStore, which keeps a small pool of read-only
+# connections (safe to share across Bokeh callbacks/threads) and pages
+# results by keyset: (experiment_id, series_number, time_step, id).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alchemy_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    experiment_id INTEGER,
+    series_number INTEGER,
+    lambda_expression TEXT,
+    time_step INTEGER,
+    canonical_hash INTEGER
+)"""
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS alchemy_data_series_step ON alchemy_data "
+    "(experiment_id, series_number, time_step, id, lambda_expression)",
+    "CREATE INDEX IF NOT EXISTS alchemy_data_canonical ON alchemy_data "
+    "(canonical_hash, experiment_id, series_number, time_step)",
+)
+
+# Stored for expressions that do not parse, so the backfill in
+# ensure_schema tries every row once; NULL means "not hashed yet".
+UNPARSABLE_HASH = 0
+
+COLUMNS = ("id", "experiment_id", "series_number", "time_step", "lambda_expression", "canonical_hash")
+
+
+def to_sql_int(h: int) -> int:
+    # SQLite integers are signed 64-bit.
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def expression_hash(expr: str) -> int | None:
+    # None for expressions that do not parse.
+    ast = parse_expression(expr)
+    if ast is None:
+        return None
+    return to_sql_int(canonical_hash(ast))
+
+
+def stored_hash(expr: str) -> int:
+    h = expression_hash(expr)
+    return UNPARSABLE_HASH if h is None else h
+
+
+def columns_of(conn: sqlite3.Connection, table: str = "alchemy_data") -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def ensure_schema(conn: sqlite3.Connection, backfill_hashes: bool = True, batch: int = 10000):
+    # Creates the table and indexes, migrating an older table (without
+    # time_step/canonical_hash) in place. The backfill hashes rows written
+    # without a hash (by the migration or by other writers), batch rows at
+    # a time.
+    conn.execute(SCHEMA)
+    cols = columns_of(conn)
+    if "time_step" not in cols:
+        conn.execute("ALTER TABLE alchemy_data ADD COLUMN time_step INTEGER")
+        conn.execute("""
+            UPDATE alchemy_data SET time_step = (
+                SELECT t.step FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY experiment_id, series_number ORDER BY id) AS step
+                    FROM alchemy_data) AS t
+                WHERE t.id = alchemy_data.id)""")
+    if "canonical_hash" not in cols:
+        conn.execute("ALTER TABLE alchemy_data ADD COLUMN canonical_hash INTEGER")
+    last = -1
+    while backfill_hashes:
+        rows = conn.execute("SELECT id, lambda_expression FROM alchemy_data "
+                            "WHERE canonical_hash IS NULL AND id > ? ORDER BY id LIMIT ?",
+                            (last, batch)).fetchall()
+        if not rows:
+            break
+        conn.executemany("UPDATE alchemy_data SET canonical_hash = ? WHERE id = ?",
+                         [(stored_hash(expr), id) for id, expr in rows])
+        last = rows[-1][0]
+    for index in INDEXES:
+        conn.execute(index)
+    conn.commit()
+
+
+def insert_terms(conn: sqlite3.Connection, experiment_id: int, series_number: int,
+                 expressions, hashes=None) -> int:
+    # Appends to a series, continuing its time steps. hashes (already in
+    # SQL form) can be passed when the caller computed them elsewhere,
+    # e.g. in worker processes.
+    expressions = list(expressions)
+    if hashes is None:
+        hashes = [stored_hash(expr) for expr in expressions]
+    (last,) = conn.execute(
+        "SELECT MAX(time_step) FROM alchemy_data WHERE experiment_id = ? AND series_number = ?",
+        (experiment_id, series_number)).fetchone()
+    start = (last or 0) + 1
+    conn.executemany(
+        "INSERT INTO alchemy_data (experiment_id, series_number, lambda_expression, time_step, canonical_hash) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [(experiment_id, series_number, expr, start + i, h)
+         for i, (expr, h) in enumerate(zip(expressions, hashes))])
+    return len(expressions)
+
+
+@dataclass
+class Page:
+    rows: list[tuple]
+    columns: tuple[str, ...]
+    next_key: tuple | None
+
+
+class AlchemyStore:
+    def __init__(self, db: str, pool_size: int = 4):
+        self.db = db
+        self.pool_size = pool_size
+        self.pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self.opened = 0
+        self.legacy = None
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db}?mode=ro", uri=True, check_same_thread=False)
+        if self.legacy is None:
+            self.legacy = "time_step" not in columns_of(conn)
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            if self.opened < self.pool_size:
+                self.opened += 1
+                conn = self._open()
+            else:
+                conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            self.pool.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self.opened = 0
+
+    def __enter__(self) -> AlchemyStore:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _source(self) -> str:
+        if not self.legacy:
+            return "alchemy_data"
+        # Databases written before time_step existed: number rows on the fly.
+        return ("(SELECT id, experiment_id, series_number, lambda_expression, NULL AS canonical_hash, "
+                "ROW_NUMBER() OVER (PARTITION BY experiment_id, series_number ORDER BY id) AS time_step "
+                "FROM alchemy_data)")
+
+    def query(self, experiment_ids=None, series=None, time_steps=None, contains: str | None = None,
+              canonical: int | str | ASTNode | None = None, columns=COLUMNS,
+              page_size: int = 1000, after: tuple | None = None) -> Page:
+        # series and time_steps are inclusive (lo, hi) ranges, either end
+        # may be None. canonical matches a hash, an expression or an AST up
+        # to renaming of bound variables. Pass page.next_key as `after` to
+        # get the following page.
+        where = []
+        params = []
+        if experiment_ids is not None:
+            experiment_ids = list(experiment_ids)
+            where.append(f"experiment_id IN ({','.join('?' * len(experiment_ids))})")
+            params += experiment_ids
+        for column, bounds in (("series_number", series), ("time_step", time_steps)):
+            if bounds is None:
+                continue
+            lo, hi = bounds
+            if lo is not None:
+                where.append(f"{column} >= ?")
+                params.append(lo)
+            if hi is not None:
+                where.append(f"{column} <= ?")
+                params.append(hi)
+        if contains is not None:
+            where.append("instr(lambda_expression, ?) > 0")
+            params.append(contains)
+        if canonical is not None:
+            match canonical:
+                case int():
+                    h = to_sql_int(canonical) if canonical >= 0 else canonical
+                case str():
+                    h = expression_hash(canonical)
+                case _:
+                    h = to_sql_int(canonical_hash(canonical))
+            where.append("canonical_hash = ?")
+            params.append(h)
+        if after is not None:
+            where.append("(experiment_id, series_number, time_step, id) > (?, ?, ?, ?)")
+            params += list(after)
+
+        key = ("experiment_id", "series_number", "time_step", "id")
+        select = list(columns) + [k for k in key if k not in columns]
+        with self.connection() as conn:
+            sql = (f"SELECT {', '.join(select)} FROM {self._source()} "
+                   f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+                   f"ORDER BY experiment_id, series_number, time_step, id LIMIT ?")
+            rows = conn.execute(sql, params + [page_size]).fetchall()
+
+        next_key = None
+        if len(rows) == page_size:
+            last = rows[-1]
+            next_key = tuple(last[select.index(k)] for k in key)
+        n = len(columns)
+        return Page([row[:n] for row in rows], tuple(columns), next_key)
+
+    def iter_query(self, **filters):
+        after = filters.pop("after", None)
+        while True:
+            page = self.query(after=after, **filters)
+            yield from page.rows
+            if page.next_key is None:
+                return
+            after = page.next_key
+
+    def read_frame(self, columns=("experiment_id", "series_number", "time_step", "lambda_expression"),
+                   **filters):
+        import pandas as pd
+
+        return pd.DataFrame(list(self.iter_query(columns=columns, page_size=50000, **filters)),
+                            columns=list(columns))
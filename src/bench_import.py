@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Guards the startup cost of the dependency-light core: each sample is a
+# fresh interpreter that imports the core modules, compared against a bare
+# interpreter start. Also fails if any optional rendering/plotting package
+# gets pulled in by the core.
+
+CORE_MODULES = [
+    "lambda_token",
+    "lambda_ast",
+    "lambda_traverse",
+    "lambda_parse",
+    "lambda_codec",
+    "btree_generator",
+    "fontana_generator",
+    "utils",
+]
+
+HEAVY_MODULES = ["ete3", "PyQt5", "PyQt6", "matplotlib", "bokeh", "pandas"]
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_import(statement: str) -> tuple[float, list[str]]:
+    code = (
+        "import sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"{statement}\n"
+        "t1 = time.perf_counter()\n"
+        "import json\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps([t1 - t0, heavy]))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR,
+                         check=True, capture_output=True, text=True).stdout
+    elapsed, heavy = json.loads(out.splitlines()[-1])
+    return elapsed, heavy
+
+
+def measure(modules: list[str], repeat: int) -> dict:
+    statement = "\n".join(f"import {m}" for m in modules)
+    samples = []
+    heavy = set()
+    for _ in range(repeat):
+        elapsed, loaded = time_import(statement)
+        samples.append(elapsed)
+        heavy.update(loaded)
+    return {
+        "modules": modules,
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "heavy_modules": sorted(heavy),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time guard for the core modules.")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=300.0,
+                        help="fail if the median core import exceeds this")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = measure(CORE_MODULES, args.repeat)
+    result["budget_s"] = args.budget_ms / 1000
+    ok = not result["heavy_modules"] and result["median_s"] <= result["budget_s"]
+    result["ok"] = ok
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"core import: median {result['median_s'] * 1000:.1f} ms, "
+              f"min {result['min_s'] * 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        if result["heavy_modules"]:
+            print("optional modules imported by the core: " + ", ".join(result["heavy_modules"]))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
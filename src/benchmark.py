@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from btree_generator import BtreeGen, Standardization
+from compare_generators import average_degree, r_app_abs
+from fontana_generator import FontanaGen
+from lambda_canon import canonical_hash
+from lambda_metrics import term_metrics
+from lambda_parse import LambdaLexer, LambdaParser
+from lambda_traverse import count_kinds
+
+# Speed and memory baselines for the core code paths. Every case is run over
+# a range of sizes; per size we record the best time per operation over
+# several repeats (each pass loops over the inputs for at least
+# MIN_PASS_SECONDS, so short operations are not lost in timer noise), the
+# median, the throughput, and the peak traced allocation of one pass.
+# Each point also times a fixed pure-Python reference loop, and the
+# baseline comparison divides by it, so a machine that is uniformly slower
+# (another load, frequency scaling) does not read as a regression.
+# log(time) is fitted against log(mean tree size) to get the scaling
+# exponent; for most cases that is the size parameter itself, for
+# fontana.random_tree it is measured, since max_depth only bounds the size.
+#
+#   python src/benchmark.py                       # writes benchmarks/<commit>.json
+#   python src/benchmark.py --baseline benchmarks/<old>.json --threshold 0.25
+#
+# With --baseline, any point that got slower by more than the threshold is
+# reported and the exit status is 1.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(SRC_DIR, "..", "benchmarks")
+
+N_INPUTS = 200
+MIN_PASS_SECONDS = 0.05
+
+
+def seed(n: int = 0):
+    random.seed(n)
+    np.random.seed(n)
+
+
+def btree_terms(n_nodes: int, count: int = N_INPUTS):
+    seed(n_nodes)
+    gen = BtreeGen(n_nodes=n_nodes, std=Standardization.PREFIX)
+    return [gen.random_tree() for _ in range(count)]
+
+
+def fontana_random_tree(max_depth: int):
+    gen = FontanaGen(max_depth=max_depth)
+    seed(max_depth)
+    nodes = np.mean([sum(count_kinds(gen.random_tree())) for _ in range(10 * N_INPUTS)])
+    return gen.random_tree, [()] * N_INPUTS, float(nodes)
+
+
+def btree_random_tree(n_nodes: int):
+    gen = BtreeGen(n_nodes=n_nodes)
+    return gen.random_tree, [()] * N_INPUTS
+
+
+def lex(n_nodes: int):
+    return LambdaLexer, [(ast.tolambda(),) for ast in btree_terms(n_nodes)]
+
+
+def parse(n_nodes: int):
+    return lambda s: LambdaParser(LambdaLexer(s)).parse(), [(ast.tolambda(),) for ast in btree_terms(n_nodes)]
+
+
+def tolambda(n_nodes: int):
+    return lambda ast: ast.tolambda(), [(ast,) for ast in btree_terms(n_nodes)]
+
+
+def metric(fn):
+    def setup(n_nodes: int):
+        return fn, [(ast,) for ast in btree_terms(n_nodes)]
+    return setup
+
+
+SIZES = [10, 20, 40, 80, 160, 320]
+
+# name -> (setup(size) -> (fn, argument tuples[, mean tree size]), size label, sizes)
+CASES = {
+    "fontana.random_tree": (fontana_random_tree, "max_depth", [4, 8, 12, 16, 20, 24]),
+    "btree.random_tree": (btree_random_tree, "n_nodes", SIZES),
+    "lexer": (lex, "n_nodes", SIZES),
+    "parser": (parse, "n_nodes", SIZES),
+    "tolambda": (tolambda, "n_nodes", SIZES),
+    "metric.average_degree": (metric(average_degree), "n_nodes", SIZES),
+    "metric.r_app_abs": (metric(r_app_abs), "n_nodes", SIZES),
+    "metric.term_metrics": (metric(term_metrics), "n_nodes", SIZES),
+    "metric.canonical_hash": (metric(canonical_hash), "n_nodes", SIZES),
+}
+
+
+def time_pass(fn, inputs, loops: int = 1) -> float:
+    t0 = time.perf_counter()
+    for _ in range(loops):
+        for args in inputs:
+            fn(*args)
+    return time.perf_counter() - t0
+
+
+def _reference_loop():
+    total = 0
+    for i in range(100000):
+        total += i * i % 7
+    return total
+
+
+def reference_seconds(repeat: int = 5) -> float:
+    return min(time_pass(_reference_loop, [()]) for _ in range(repeat))
+
+
+def calibrate_loops(fn, inputs, min_seconds: float = MIN_PASS_SECONDS) -> int:
+    # Passes over the inputs needed for one timed pass to last min_seconds.
+    loops = 1
+    while (elapsed := time_pass(fn, inputs, loops)) < min_seconds:
+        loops = max(loops * 2, int(loops * min_seconds / max(elapsed, 1e-9)) + 1)
+    return loops
+
+
+def peak_memory(fn, inputs) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for args in inputs:
+            fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def fit_exponent(xs, ys) -> float | None:
+    # Slope of log y against log x.
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    ok = (xs > 0) & (ys > 0)
+    if ok.sum() < 2:
+        return None
+    return float(np.polyfit(np.log(xs[ok]), np.log(ys[ok]), 1)[0])
+
+
+def run_case(name: str, repeat: int, sizes=None) -> dict:
+    setup, label, default_sizes = CASES[name]
+    points = []
+    for size in sizes or default_sizes:
+        fn, inputs, *nodes = setup(size)
+        seed(size)
+        loops = calibrate_loops(fn, inputs)
+        times = []
+        relative = []
+        for _ in range(repeat):
+            # The reference is timed next to every pass to follow drift.
+            reference = reference_seconds(3)
+            times.append(time_pass(fn, inputs, loops) / (loops * len(inputs)))
+            relative.append(times[-1] / reference)
+        per_op = min(times)
+        points.append({
+            label: size,
+            "nodes": nodes[0] if nodes else size,
+            "seconds_per_op": per_op,
+            "median_seconds_per_op": float(np.median(times)),
+            "relative_to_reference": min(relative),
+            "ops_per_s": 1 / per_op if per_op else None,
+            "peak_bytes": peak_memory(fn, inputs),
+        })
+    return {
+        "size": label,
+        "points": points,
+        "exponent": fit_exponent([p["nodes"] for p in points], [p["seconds_per_op"] for p in points]),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR,
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(names, repeat: int = 7, quick: bool = False) -> dict:
+    results = {}
+    for name in names:
+        sizes = CASES[name][2][:3] if quick else None
+        results[name] = run_case(name, repeat, sizes)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    # Points slower than baseline * (1 + threshold), matched by case and
+    # size, compared as multiples of the reference loop time.
+    regressions = []
+    for name, case in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        label = case["size"]
+        base_points = {p[label]: p for p in base["points"]}
+        for p in case["points"]:
+            b = base_points.get(p[label])
+            if b is None:
+                continue
+            if "relative_to_reference" in p and "relative_to_reference" in b:
+                ratio = p["relative_to_reference"] / b["relative_to_reference"]
+            else:
+                ratio = p["seconds_per_op"] / b["seconds_per_op"]
+            if ratio > 1 + threshold:
+                regressions.append(f"{name} {label}={p[label]}: {ratio:.2f}x slower "
+                                   f"({b['seconds_per_op'] * 1e6:.1f} -> {p['seconds_per_op'] * 1e6:.1f} us/op)")
+    return regressions
+
+
+def plot(report: dict, path: str):
+    # matplotlib is an optional extra; only plotting needs it.
+    import matplotlib.pyplot as plt
+
+    names = list(report["results"])
+    fig, axs = plt.subplots(len(names), 1, figsize=(6, 3 * len(names)), tight_layout=True)
+    for ax, name in zip(np.atleast_1d(axs), names):
+        case = report["results"][name]
+        xs = [p["nodes"] for p in case["points"]]
+        ax.loglog(xs, [p["seconds_per_op"] for p in case["points"]], "o-")
+        exponent = case["exponent"]
+        ax.set_title(name if exponent is None else f"{name} (~n^{exponent:.2f})")
+        ax.set_xlabel("nodes")
+        ax.set_ylabel("s/op")
+    plt.savefig(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, memory and scaling benchmarks.")
+    parser.add_argument("cases", nargs="*", help=f"subset of: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=7, help="timed passes per point; the best counts")
+    parser.add_argument("--quick", action="store_true", help="only the three smallest sizes")
+    parser.add_argument("--out", help="result file (default benchmarks/<commit>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--plot", help="write scaling curves to this image")
+    args = parser.parse_args()
+
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+    report = run(args.cases or list(CASES), args.repeat, args.quick)
+
+    for name, case in report["results"].items():
+        last = case["points"][-1]
+        exponent = "n/a" if case["exponent"] is None else f"{case['exponent']:.2f}"
+        print(f"{name:24s} exponent {exponent:>5s}  {last['ops_per_s']:10.0f} ops/s "
+              f"at {case['size']}={last[case['size']]}, peak {last['peak_bytes'] / 1024:.0f} KiB")
+
+    out = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+
+    if args.plot:
+        plot(report, args.plot)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 from __future__ import annotations
 from typing import Any
 
-import numpy as np
 import random
 import collections
 # import ete3
@@ -10,7 +9,10 @@ import re
 from enum import Enum
 
 from lambda_ast import ASTNode
+from lambda_traverse import leaf_values, rewrite
 
+import instrument
+from rng import LegacyRNG
 import utils
 
 random.seed(314159)
@@ -79,11 +81,13 @@ class PermutationTree:
 
 
 class BtreeGen:
-    def __init__(self, freevar_p=0.2, max_free_vars=6, n_nodes=20, std=Standardization.PREFIX):
+    def __init__(self, freevar_p=0.2, max_free_vars=6, n_nodes=20, std=Standardization.PREFIX, rng=None):
         self.max_free_vars = max_free_vars
         self.freevar_p = freevar_p
         self.n_nodes = n_nodes
         self.std = std
+        # Any rng.py backend; the default draws from the global random state.
+        self.rng = rng if rng is not None else LegacyRNG()
 
     def set_max_free_vars(self, n: int) -> BtreeGen:
         self.max_free_vars = n
@@ -94,34 +98,23 @@ class BtreeGen:
         return self
 
     def postfix_standardize(self, tree: ASTNode) -> ASTNode:
-        def one_step_lookahead(tree):
-            match tree.left, tree.right:
-                case (None, None):
-                    return True
-                case (None, _) | (_, None) | (_, _):
-                    return False
-
-        if tree.right is not None:
-            if one_step_lookahead(tree.right) and tree.right.value.isalpha():
-                tree.right = ASTNode(tree.right, None).set_value(tree.right.value)
-            else:
-                self.postfix_standardize(tree.right)
-        
-        if tree.left is not None:
-            if one_step_lookahead(tree.left) and tree.left.value.isalpha():
-                tree.left = ASTNode(tree.left, None).set_value(tree.left.value)
-            else:
-                self.postfix_standardize(tree.left)
-        return tree
+        # Every free-variable leaf below the root gets wrapped in a binder
+        # of the same name.
+        def bind_free_leaf(node):
+            if node.left is None and node.right is None and node.value.isalpha():
+                return ASTNode(node, None).set_value(node.value)
+
+        return rewrite(tree, bind_free_leaf, include_root=False)
 
     def prefix_standardize(self, tree: ASTNode) -> ASTNode:
         node = tree
         if tree.must_have_free_variables():
             node = ASTNode(node, None).set_value(r"x0")
             pass
+        values = leaf_values(tree)
         for i in range(self.max_free_vars + 1):
             freevar_value = chr(97 + i)
-            if tree.search_for_value(freevar_value):
+            if freevar_value in values:
                 node = ASTNode(node, None).set_value(freevar_value)
         return node
 
@@ -136,17 +129,22 @@ class BtreeGen:
 
     def random_lambda(self):
         random_tree = self.random_tree()
-        return random_tree.tolambda()
+        clock = instrument.clock()
+        s = random_tree.tolambda()
+        clock.lap("btree.tolambda")
+        return s
 
     def annotate_tree(self, tree: PermutationTree) -> ASTNode:
         match (tree.left, tree.right):
             case (None, None):
-                coin = random.random() < self.freevar_p
+                coin = self.rng.random() < self.freevar_p
                 if coin or tree.depth == 0:
-                    random_freevar = chr(97 + random.randint(0, self.max_free_vars))
+                    if instrument.enabled:
+                        instrument.count("btree.free_leaves")
+                    random_freevar = chr(97 + self.rng.randint(0, self.max_free_vars))
                     return ASTNode(None, None).set_value(random_freevar)
                 else:
-                    random_variable = f"x{random.randint(0, tree.depth - 1 if tree.depth != 0 else 0)}"
+                    random_variable = f"x{self.rng.randint(0, tree.depth - 1 if tree.depth != 0 else 0)}"
                     return ASTNode(None, None).set_value(random_variable)
             case (_, None):
                 subtree = self.annotate_tree(tree.left)
@@ -160,13 +158,22 @@ class BtreeGen:
                 return ASTNode(left, right)
 
     def random_tree(self):
-        permutation = np.random.permutation(self.n_nodes)
+        clock = instrument.clock()
+        permutation = self.rng.permutation(self.n_nodes)
+        clock.lap("btree.permutation")
         tree = PermutationTree()
         for i in permutation:
             tree.insert(i)
+        clock.lap("btree.insert")
         tree.annotate_depths()
+        clock.lap("btree.annotate_depths")
         tree = self.annotate_tree(tree)
+        clock.lap("btree.annotate_tree")
         tree = self.standardize(tree)
+        clock.lap("btree.standardize")
+        if instrument.enabled:
+            instrument.count("btree.trees")
+            instrument.count("btree.nodes", self.n_nodes)
         return tree
 
 
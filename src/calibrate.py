@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+
+import numpy as np
+
+from fontana_generator import FontanaGen
+
+# Size and shape of FontanaGen trees computed from its probability schedule
+# instead of by sampling, and a solver that picks application_prange,
+# abstraction_prange and max_depth to hit target statistics.
+#
+# A node at depth d <= max_depth is an abstraction with probability a[d],
+# an application with probability p[d] and otherwise a leaf; deeper nodes
+# are leaves. Children are independent given their depth, so expectations
+# and distributions follow by dynamic programming from the deepest level
+# up. The schedule mirrors random_lambda_helper, which steps the
+# abstraction probability by the application increment and vice versa.
+#
+#   gen = calibrate({"nodes": 40, "height": 8})
+#   check(gen)      # predicted vs sampled means and size percentiles
+#
+# `python src/calibrate.py --like-btree 40` matches the node count, height
+# and application/abstraction balance of BtreeGen(n_nodes=40).
+
+STATS = ("nodes", "nodes_std", "abstractions", "applications", "leaves", "app_abs", "height")
+DEFAULT_WEIGHTS = {"nodes": 1.0, "height": 1.0, "app_abs": 1.0}
+QUANTILES = (0.1, 0.5, 0.9)
+SIZE_QUANTILES = tuple(f"nodes_p{round(q * 100)}" for q in QUANTILES)
+
+
+def schedule(max_depth, application_prange, abstraction_prange):
+    # Per-depth probabilities (abstraction, application) for depths
+    # 0..max_depth, as random_lambda_helper draws them. Arguments may be
+    # arrays of candidates (max_depth of shape (n,), pranges of shape
+    # (n, 2)); rows are then zero-padded to the deepest one, which makes
+    # the extra levels leaves.
+    max_depth = np.asarray(max_depth)
+    application_prange = np.asarray(application_prange, dtype=float)
+    abstraction_prange = np.asarray(abstraction_prange, dtype=float)
+    application_incr = (application_prange[..., 1] - application_prange[..., 0]) / (max_depth - 1)
+    abstraction_incr = (abstraction_prange[..., 1] - abstraction_prange[..., 0]) / (max_depth - 1)
+    depth = np.arange(int(max_depth.max()) + 1)
+    p_abstraction = abstraction_prange[..., 0, None] + depth * application_incr[..., None]
+    p_application = application_prange[..., 0, None] + depth * abstraction_incr[..., None]
+    # coin is uniform on [0, 1); coin <= p has probability p clipped.
+    abst = np.clip(p_abstraction, 0.0, 1.0)
+    appl = np.clip(p_abstraction + p_application, 0.0, 1.0) - abst
+    inside = depth <= max_depth[..., None]
+    return np.where(inside, abst, 0.0), np.where(inside, np.maximum(appl, 0.0), 0.0)
+
+
+def _schedule_of(gen: FontanaGen):
+    return schedule(gen.max_depth, gen.application_prange, gen.abstraction_prange)
+
+
+def height_distribution(abst, appl) -> np.ndarray:
+    # P(height == h) for h = 0..levels along the last axis; the root has
+    # depth 0 and a lone leaf height 0.
+    levels = abst.shape[-1]
+    below = np.ones(abst.shape[:-1] + (levels + 1,))  # P(height <= h) below max_depth
+    for d in range(levels - 1, -1, -1):
+        a, p = abst[..., d, None], appl[..., d, None]
+        leaf = 1.0 - a - p
+        cdf = np.empty_like(below)
+        cdf[..., :1] = leaf
+        cdf[..., 1:] = leaf + a * below[..., :-1] + p * below[..., :-1] ** 2
+        below = cdf
+    return np.diff(below, prepend=0.0)
+
+
+def size_distribution(abst, appl, cap: int = 4096) -> np.ndarray:
+    # P(nodes == n) for n = 0..cap-1, and P(nodes >= cap) in the last slot.
+    below = np.zeros(cap + 1)
+    below[1] = 1.0
+    for d in range(len(abst) - 1, -1, -1):
+        leaf = 1.0 - abst[d] - appl[d]
+        body = below[:cap]
+        pair = np.convolve(body, body)[:cap]
+        pmf = np.zeros(cap + 1)
+        pmf[1] = leaf
+        pmf[2:cap + 1] += abst[d] * body[1:cap]
+        pmf[2:cap + 1] += appl[d] * pair[1:cap]
+        pmf[cap] = max(1.0 - pmf[:cap].sum(), 0.0)
+        below = pmf
+    return below
+
+
+def moments(abst, appl) -> dict:
+    # Expected statistics; arrays over the leading axes for batched
+    # schedules.
+    nodes = second = np.ones(abst.shape[:-1])
+    abstractions = applications = np.zeros(abst.shape[:-1])
+    for d in range(abst.shape[-1] - 1, -1, -1):
+        a, p = abst[..., d], appl[..., d]
+        leaf = 1.0 - a - p
+        # S = 1 + S' for an abstraction, 1 + S' + S'' for an application.
+        second = (leaf + a * (1 + 2 * nodes + second)
+                  + p * (1 + 4 * nodes + 2 * second + 2 * nodes * nodes))
+        abstractions = a * (1 + abstractions) + 2 * p * abstractions
+        applications = p * (1 + 2 * applications) + a * applications
+        nodes = 1 + (a + 2 * p) * nodes
+    heights = height_distribution(abst, appl)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        app_abs = np.where(abstractions > 0, applications / abstractions, 0.0)
+    return {
+        "nodes": nodes,
+        "nodes_std": np.sqrt(np.maximum(second - nodes * nodes, 0.0)),
+        "abstractions": abstractions,
+        "applications": applications,
+        "leaves": nodes - abstractions - applications,
+        "app_abs": app_abs,
+        "height": heights @ np.arange(heights.shape[-1]),
+    }
+
+
+def size_quantiles(abst, appl, cap: int = 4096) -> dict:
+    # Node count percentiles (SIZE_QUANTILES); cap stands for "cap or more".
+    cdf = np.cumsum(size_distribution(abst, appl, cap))
+    return {name: float(np.searchsorted(cdf, q)) for name, q in zip(SIZE_QUANTILES, QUANTILES)}
+
+
+def predict(gen: FontanaGen) -> dict:
+    abst, appl = _schedule_of(gen)
+    stats = {name: float(value) for name, value in moments(abst, appl).items()}
+    stats.update(size_quantiles(abst, appl))
+    return stats
+
+
+def _loss(max_depth, params, targets: dict, weights: dict) -> np.ndarray:
+    stats = moments(*schedule(max_depth, params[:, :2], params[:, 2:]))
+    loss = np.zeros(len(params))
+    for name, target in targets.items():
+        loss += weights.get(name, 1.0) * ((stats[name] - target) / max(abs(target), 1e-9)) ** 2
+    return loss
+
+
+def _search(max_depth: np.ndarray, params: np.ndarray, targets: dict, weights: dict, tol: float = 1e-4):
+    # Compass search on (application_prange, abstraction_prange) in [0, 1]^4,
+    # for all candidate rows at once: each row takes its best move and
+    # doubles its step, or quarters the step if no move helps.
+    params = params.copy()
+    loss = _loss(max_depth, params, targets, weights)
+    step = np.full(len(params), 0.25)
+    moves = np.concatenate([np.eye(4), -np.eye(4)])
+    while (active := step > tol).any():
+        rows = np.flatnonzero(active)
+        trials = np.clip(params[rows, None, :] + moves * step[rows, None, None], 0.0, 1.0)
+        trial_loss = _loss(np.repeat(max_depth[rows], len(moves)), trials.reshape(-1, 4),
+                           targets, weights).reshape(len(rows), len(moves))
+        best = trial_loss.argmin(axis=1)
+        best_loss = trial_loss[np.arange(len(rows)), best]
+        better = best_loss < loss[rows]
+        moved = rows[better]
+        params[moved] = trials[better, best[better]]
+        loss[moved] = best_loss[better]
+        step[moved] = np.minimum(step[moved] * 2, 0.25)
+        step[rows[~better]] /= 4
+    return params, loss
+
+
+def calibrate(targets: dict, weights: dict | None = None, depths=range(2, 31), starts=None) -> FontanaGen:
+    # FontanaGen whose predicted statistics (keys of STATS) best match
+    # targets, by weighted squared relative error.
+    unknown = set(targets) - set(STATS)
+    if unknown:
+        raise ValueError(f"unknown statistics: {', '.join(sorted(unknown))}")
+    weights = weights or DEFAULT_WEIGHTS
+    starts = starts or [(0.3, 0.5, 0.5, 0.3), (0.2, 0.2, 0.2, 0.2), (0.5, 0.1, 0.1, 0.5)]
+    rows = list(itertools.product(depths, starts))
+    max_depth = np.array([d for d, _ in rows])
+    params, loss = _search(max_depth, np.array([s for _, s in rows], dtype=float), targets, weights)
+    best = loss.argmin()
+    return FontanaGen(max_depth=int(max_depth[best]),
+                      application_prange=tuple(float(p) for p in params[best, :2]),
+                      abstraction_prange=tuple(float(p) for p in params[best, 2:]))
+
+
+def sample_stats(gen, n: int = 2000, seed: int = 0) -> dict:
+    from lambda_metrics import term_metrics
+
+    gen.rng.seed(seed)
+    rows = [term_metrics(gen.random_tree()) for _ in range(n)]
+    nodes = np.array([r["nodes"] for r in rows], dtype=float)
+    abstractions = sum(r["abstractions"] for r in rows)
+    applications = sum(r["applications"] for r in rows)
+    return {
+        "nodes": float(nodes.mean()),
+        "nodes_std": float(nodes.std()),
+        "abstractions": abstractions / n,
+        "applications": applications / n,
+        "leaves": float(np.mean([r["leaves"] for r in rows])),
+        "app_abs": applications / abstractions if abstractions else 0.0,
+        "height": float(np.mean([r["height"] for r in rows])),
+        **{name: float(np.quantile(nodes, q, method="inverted_cdf"))
+           for name, q in zip(SIZE_QUANTILES, QUANTILES)},
+    }
+
+
+def check(gen: FontanaGen, n: int = 2000, seed: int = 0) -> dict:
+    # {statistic: (predicted, sampled)} for the calibrated generator.
+    predicted = predict(gen)
+    sampled = sample_stats(gen, n, seed)
+    return {name: (predicted[name], sampled[name]) for name in STATS + SIZE_QUANTILES}
+
+
+def btree_targets(n_nodes: int, n: int = 2000, seed: int = 0) -> dict:
+    from btree_generator import BtreeGen
+
+    stats = sample_stats(BtreeGen(n_nodes=n_nodes), n, seed)
+    return {name: stats[name] for name in DEFAULT_WEIGHTS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit FontanaGen parameters to target tree statistics.")
+    parser.add_argument("--nodes", type=float, help="target mean node count")
+    parser.add_argument("--height", type=float, help="target mean height")
+    parser.add_argument("--app-abs", type=float, help="target applications per abstraction")
+    parser.add_argument("--like-btree", type=int, metavar="N",
+                        help="targets sampled from BtreeGen(n_nodes=N)")
+    parser.add_argument("--min-depth", type=int, default=2)
+    parser.add_argument("--max-depth", type=int, default=30)
+    parser.add_argument("--check", type=int, default=2000, metavar="N",
+                        help="trees to sample for the check (0 to skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    targets = btree_targets(args.like_btree, seed=args.seed) if args.like_btree else {}
+    for name, value in (("nodes", args.nodes), ("height", args.height), ("app_abs", args.app_abs)):
+        if value is not None:
+            targets[name] = value
+    if not targets:
+        parser.error("give at least one target")
+
+    gen = calibrate(targets, depths=range(max(args.min_depth, 2), args.max_depth + 1))
+    print(f"FontanaGen(max_depth={gen.max_depth}, "
+          f"application_prange=({gen.application_prange[0]:.4f}, {gen.application_prange[1]:.4f}), "
+          f"abstraction_prange=({gen.abstraction_prange[0]:.4f}, {gen.abstraction_prange[1]:.4f}))")
+    rows = check(gen, args.check, args.seed) if args.check else {k: (v, None) for k, v in predict(gen).items()}
+    print(f"{'statistic':<14}{'target':>10}{'predicted':>12}{'sampled':>12}")
+    for name, (predicted, sampled) in rows.items():
+        target = f"{targets[name]:.3f}" if name in targets else "-"
+        sampled = f"{sampled:.3f}" if sampled is not None else "-"
+        print(f"{name:<14}{target:>10}{predicted:>12.3f}{sampled:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import functools
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+
+import numpy as np
+
+import alchemy_store
+import instrument
+import lambda_codec
+import utils
+from btree_generator import BtreeGen, Standardization
+from fontana_generator import FontanaGen
+from lambda_canon import canonical_hash, canonicalize
+from lambda_metrics import METRIC_NAMES, term_metrics
+from lambda_svg import write_svg
+from parse_cache import parse_checked
+from rng import BACKENDS, make_rng
+
+# One streaming front end for the generators and tools in src/:
+#
+#   python src/cli.py generate -g btree -n 100000 --nodes 40 -o binary > terms.bin
+#   python src/cli.py stats -i binary --workers 8 < terms.bin > stats.tsv
+#
+# Subcommands read terms from stdin and/or write them to stdout, either as
+# text (one term per line; the `1` header and `eval ...;` framing of
+# dump_gen_in_alchemy_fmt are accepted) or binary (length-prefixed
+# lambda_codec records). Work is done in batches, --workers spreads the
+# batches over a process pool and output always follows input order.
+# --seed seeds every batch with seed + batch index, so results do not
+# depend on the number of workers; without it the base seed is drawn from
+# the OS once per run, so batches still differ from one another.
+
+
+def batched(items, n: int):
+    batch = []
+    index = 0
+    for item in items:
+        batch.append(item)
+        if len(batch) == n:
+            yield index, batch
+            index += 1
+            batch = []
+    if batch:
+        yield index, batch
+
+
+def ordered_map(fn, items, workers: int):
+    # Like Pool.imap, but never more than 2 * workers batches in flight, so
+    # an endless stdin does not get buffered into memory.
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.apply_async(fn, (item,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def seed_batch(seed: int | None, index: int):
+    if seed is not None:
+        random.seed(seed + index)
+        np.random.seed((seed + index) % 2**32)
+
+
+def read_terms(fmt: str):
+    # Binary records, or (line number, term) for text.
+    if fmt == "binary":
+        yield from lambda_codec.read_records(sys.stdin.buffer)
+    else:
+        for n, line in enumerate(sys.stdin, 1):
+            term = utils.strip_alchemy_fmt(line)
+            if term is not None:
+                yield n, term
+
+
+def load(item, fmt: str):
+    # None for a text line that does not parse; the error goes to stderr
+    # and the line is skipped.
+    if fmt == "binary":
+        return lambda_codec.decode(item)
+    n, term = item
+    ast, message = parse_checked(term)
+    if ast is None:
+        print(f"line {n}: {message}", file=sys.stderr)
+    return ast
+
+
+def dump(ast, fmt: str):
+    match fmt:
+        case "binary":
+            return lambda_codec.encode(ast)
+        case "alchemy":
+            return f"eval {ast.tolambda()};"
+        case _:
+            return ast.tolambda()
+
+
+def write_outputs(results, fmt: str):
+    if fmt == "binary":
+        out = sys.stdout.buffer
+        for batch in results:
+            for blob in batch:
+                lambda_codec.write_record(out, blob)
+        out.flush()
+        return
+    if fmt == "alchemy":
+        sys.stdout.write("1\n\n")
+    for batch in results:
+        sys.stdout.write("".join(line + "\n" for line in batch))
+    sys.stdout.flush()
+
+
+def make_generator(args):
+    rng = make_rng(getattr(args, "rng", "legacy"))
+    if args.generator == "fontana":
+        return FontanaGen(max_depth=args.max_depth, max_nvars=args.max_nvars, rng=rng)
+    return BtreeGen(freevar_p=args.freevar_p,
+                    max_free_vars=args.max_free_vars,
+                    n_nodes=args.nodes,
+                    std=Standardization[args.std.upper()],
+                    rng=rng)
+
+
+def generate_batch(args, task):
+    index, count = task
+    seed_batch(args.seed, index)
+    gen = make_generator(args)
+    if args.seed is not None:
+        gen.rng.seed(args.seed + index)
+    return [dump(gen.random_tree(), args.output_format) for _ in range(count)]
+
+
+def map_batch(args, transform, task):
+    index, items = task
+    seed_batch(args.seed, index)
+    asts = (load(item, args.input_format) for item in items)
+    return [transform(args, ast) for ast in asts if ast is not None]
+
+
+def convert(args, ast):
+    return dump(ast, args.output_format)
+
+
+def stats(args, ast):
+    m = term_metrics(ast)
+    if args.json:
+        return json.dumps(m)
+    return "\t".join(str(int(m[k])) for k in METRIC_NAMES)
+
+
+def canonical(args, ast):
+    if args.hash:
+        return f"{canonical_hash(ast):016x}"
+    return dump(canonicalize(ast), args.output_format)
+
+
+def to_row(args, ast):
+    return ast.tolambda(), alchemy_store.to_sql_int(canonical_hash(ast))
+
+
+def render(args, ast):
+    return "\n".join(ast.iter_ascii(args.max_indent)) + "\n"
+
+
+def render_svg_batch(args, task):
+    index, items = task
+    paths = []
+    for i, item in enumerate(items):
+        ast = load(item, args.input_format)
+        if ast is None:
+            continue
+        path = os.path.join(args.svg_dir, f"term_{index * args.batch_size + i}.svg")
+        write_svg(ast, path)
+        paths.append(path)
+    return paths
+
+
+def run_map(args, transform):
+    tasks = batched(read_terms(args.input_format), args.batch_size)
+    fn = functools.partial(map_batch, args, transform)
+    return ordered_map(fn, tasks, args.workers)
+
+
+def cmd_generate(args):
+    if args.seed is None:
+        # A generator made per batch would otherwise restart a block
+        # backend from its default seed and repeat the same terms.
+        args.seed = random.SystemRandom().randrange(2**32)
+    counts = [min(args.batch_size, args.count - start)
+              for start in range(0, args.count, args.batch_size)]
+    fn = functools.partial(generate_batch, args)
+    write_outputs(ordered_map(fn, enumerate(counts), args.workers), args.output_format)
+
+
+def cmd_parse(args):
+    write_outputs(run_map(args, convert), args.output_format)
+
+
+def cmd_stats(args):
+    if not args.json:
+        sys.stdout.write("\t".join(METRIC_NAMES) + "\n")
+    write_outputs(run_map(args, stats), "text")
+
+
+def cmd_canonicalize(args):
+    write_outputs(run_map(args, canonical), "text" if args.hash else args.output_format)
+
+
+def cmd_render(args):
+    if args.svg_dir is None:
+        write_outputs(run_map(args, render), "text")
+        return
+    os.makedirs(args.svg_dir, exist_ok=True)
+    tasks = batched(read_terms(args.input_format), args.batch_size)
+    fn = functools.partial(render_svg_batch, args)
+    write_outputs(ordered_map(fn, tasks, args.workers), "text")
+
+
+def cmd_ingest(args):
+    conn = sqlite3.connect(args.db)
+    alchemy_store.ensure_schema(conn)
+    rows = 0
+    for batch in run_map(args, to_row):
+        exprs = [expr for expr, _ in batch]
+        hashes = [h for _, h in batch]
+        rows += alchemy_store.insert_terms(conn, args.experiment_id, args.series_number, exprs, hashes)
+        conn.commit()
+    conn.close()
+    print(f"ingested {rows} terms into {args.db}", file=sys.stderr)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    common.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    common.add_argument("--batch-size", type=int, default=1000, help="terms per batch")
+    common.add_argument("--instrument", type=float, default=None, metavar="SECONDS",
+                        help="report stage timers and counters to stderr every SECONDS "
+                             "(0: only at the end); covers the main process only")
+
+    reads = argparse.ArgumentParser(add_help=False)
+    reads.add_argument("-i", "--input-format", choices=["text", "binary"], default="text")
+
+    writes = argparse.ArgumentParser(add_help=False)
+    writes.add_argument("-o", "--output-format", choices=["text", "alchemy", "binary"], default="text")
+
+    parser = argparse.ArgumentParser(description="Generate and process random lambda terms.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("generate", parents=[common, writes], help="generate random terms")
+    p.add_argument("-g", "--generator", choices=["btree", "fontana"], default="btree")
+    p.add_argument("-n", "--count", type=int, default=100000)
+    p.add_argument("--nodes", type=int, default=20, help="btree: BST nodes")
+    p.add_argument("--freevar-p", type=float, default=0.2, help="btree: free variable probability")
+    p.add_argument("--max-free-vars", type=int, default=6, help="btree: free variable alphabet size - 1")
+    p.add_argument("--std", choices=["prefix", "postfix"], default="prefix", help="btree: standardization")
+    p.add_argument("--max-depth", type=int, default=10, help="fontana: maximum depth")
+    p.add_argument("--max-nvars", type=int, default=6, help="fontana: variables per term - 1")
+    p.add_argument("--rng", choices=list(BACKENDS), default="legacy",
+                   help="random number backend (minstd: Fontana's original stream)")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("parse", parents=[common, reads, writes], help="convert between term formats")
+    p.set_defaults(func=cmd_parse)
+
+    p = sub.add_parser("stats", parents=[common, reads], help="per-term metrics as TSV")
+    p.add_argument("--json", action="store_true", help="emit JSON lines instead of TSV")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("canonicalize", parents=[common, reads, writes],
+                       help="rename binders canonically (alpha-normal form)")
+    p.add_argument("--hash", action="store_true", help="emit 64-bit canonical hashes instead of terms")
+    p.set_defaults(func=cmd_canonicalize)
+
+    p = sub.add_parser("ingest", parents=[common, reads], help="load terms into an alchemy_data table")
+    p.add_argument("--db", default="alchemy_data.db")
+    p.add_argument("--experiment-id", type=int, required=True)
+    p.add_argument("--series-number", type=int, required=True)
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("render", parents=[common, reads], help="ASCII outline or SVG of each term")
+    p.add_argument("--max-indent", type=int, default=None)
+    p.add_argument("--svg-dir", default=None, help="write one SVG per term here and print the paths")
+    p.set_defaults(func=cmd_render)
+    return parser
+
+
+def broken_pipe_exit():
+    # The reader went away (e.g. `cli.py generate | head`). Point stdout at
+    # devnull so the interpreter's final flush does not raise again, as the
+    # Python docs on SIGPIPE recommend; stderr stays usable.
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(1)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    emitter = None
+    if args.instrument is not None:
+        instrument.enable()
+        emitter = instrument.Emitter(args.instrument or float("inf"))
+        if args.instrument:
+            emitter.start()
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        broken_pipe_exit()
+    finally:
+        if emitter is not None:
+            emitter.stop() if args.instrument else emitter.emit()
+
+
+if __name__ == "__main__":
+    main()
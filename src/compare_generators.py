@@ -3,22 +3,20 @@ from fontana_generator import FontanaGen
 
 from lambda_parse import LambdaLexer, LambdaParser
 from lambda_ast import ASTNode
-
-import matplotlib.pyplot as plt
-import matplotlib as mpl
+from lambda_traverse import count_kinds
+from corpus_cache import cached_corpus
+from stream_stats import MetricSummary
 
 
 def average_degree(tree):
     # The average degree of a graph is related to its order and size by
     # d(G) = 2 * ||G|| / |G|
     # [Die17]
-
-    ord = len([e for e in tree.edges_breadth()])
-    size = len([v for (v, _) in tree.vertices_breadth()])
-
-    if size == 0:
+    # A tree on n vertices has n - 1 edges.
+    n = sum(count_kinds(tree))
+    if n == 0:
         return 0
-    return 2 * ord / size
+    return 2 * (n - 1) / n
 
 
 def r_app_abs(tree):
@@ -30,28 +28,42 @@ def r_app_abs(tree):
     return n_app / n_abs
 
 
-def plot(fn):
+def summarize(gen, fn, n_trees: int, seed: int | None = None) -> MetricSummary:
+    # Summaries from separate runs (e.g. worker processes) can be combined
+    # with MetricSummary.merge. With a seed the sample is read from the
+    # on-disk corpus cache instead of being generated again.
+    summary = MetricSummary()
+    if seed is None:
+        for j in range(n_trees):
+            summary.add(fn(gen.random_tree()))
+        return summary.flush()
+    with cached_corpus(gen, n_trees, seed) as corpus:
+        for tree in corpus:
+            summary.add(fn(tree))
+    return summary.flush()
+
+
+def plot_summary(ax, summary: MetricSummary, **kwargs):
+    counts, edges = summary.sketch.histogram(bins=100)
+    ax.hist(edges[:-1], bins=edges, weights=counts, **kwargs)
+
+
+def plot(fn, n_trees: int = 10000, seed: int | None = 0):
+    # matplotlib is an optional extra; only plotting needs it.
+    import matplotlib.pyplot as plt
+    import matplotlib as mpl
+
     print(fn.__name__)
     fig, axs = plt.subplots(2, 1, sharex=True, tight_layout=True)
     cmap = mpl.colormaps['viridis']
 
     for i in range(30, 2, -1):
-        data = []
-        gen = FontanaGen(max_depth=i)
-        for j in range(10000):
-            tree = gen.random_tree()
-            adeg = fn(tree)
-            data.append(adeg)
-        axs[0].hist(data, alpha=0.5, bins=100, label=i, color=cmap(i / 30))
+        summary = summarize(FontanaGen(max_depth=i), fn, n_trees, seed)
+        plot_summary(axs[0], summary, alpha=0.5, label=i, color=cmap(i / 30))
 
     for i in range(2, 50):
-        data = []
-        gen = BtreeGen(n_nodes=i)
-        for j in range(10000):
-            tree = gen.random_tree()
-            adeg = fn(tree)
-            data.append(adeg)
-        axs[1].hist(data, alpha=0.5, bins=100, label=i, color=cmap(i / 50))
+        summary = summarize(BtreeGen(n_nodes=i), fn, n_trees, seed)
+        plot_summary(axs[1], summary, alpha=0.5, label=i, color=cmap(i / 50))
 
     plt.savefig(f'./img/{fn.__name__}.png')
 
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import enum
+import hashlib
+import json
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from lambda_corpus import Corpus, CorpusWriter
+
+# Generated corpora, cached on disk under a key derived from everything that
+# determines them: generator class, all of its attributes (constructor
+# parameters and the values derived from them, standardization mode
+# included), seed and count. Entries are lambda_corpus files, written to a
+# temporary file and renamed into place, so readers never see a partial
+# corpus and concurrent writers of the same key are harmless. The cache is
+# kept under max_bytes by evicting the least recently used entries.
+#
+#   corpus = cached_corpus(BtreeGen(n_nodes=40), count=10000, seed=0)
+#   for ast in corpus: ...
+#
+# Generation seeds the generator's rng backend (for the default backend,
+# the global `random` and `np.random` state) and restores the global state
+# afterwards.
+
+DEFAULT_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "lambda-btree", "corpora")
+SUFFIX = ".corpus"
+KEY_VERSION = 1
+
+
+def _jsonable(value):
+    match value:
+        case enum.Enum():
+            return f"{type(value).__name__}.{value.name}"
+        case dict():
+            return {str(k): _jsonable(v) for k, v in value.items()}
+        case list() | tuple():
+            return [_jsonable(v) for v in value]
+        case float() | int() | str() | bool() | None:
+            return value
+        case _ if hasattr(value, "config"):
+            return _jsonable(value.config())
+        case _:
+            return repr(value)
+
+
+def generator_config(gen) -> dict:
+    cls = type(gen)
+    return {"class": f"{cls.__module__}.{cls.__qualname__}", "params": _jsonable(vars(gen))}
+
+
+def config_key(gen, count: int, seed: int) -> str:
+    config = {"version": KEY_VERSION, "generator": generator_config(gen), "count": count, "seed": seed}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def generate_to(path: str, gen, count: int, seed: int):
+    state = random.getstate(), np.random.get_state()
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    if hasattr(gen, "rng"):
+        gen.rng.seed(seed)
+    try:
+        with CorpusWriter(path) as writer:
+            for _ in range(count):
+                writer.write(gen.random_tree())
+    finally:
+        random.setstate(state[0])
+        np.random.set_state(state[1])
+
+
+class CorpusCache:
+    def __init__(self, root: str | None = None, max_bytes: int = 2 << 30):
+        self.root = root or os.environ.get("LAMBDA_CORPUS_CACHE", DEFAULT_ROOT)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key + SUFFIX)
+
+    def get(self, gen, count: int, seed: int = 0) -> Corpus:
+        path = self.path(config_key(gen, count, seed))
+        try:
+            corpus = Corpus(path)
+        except (FileNotFoundError, ValueError):
+            # Missing, or damaged by something outside the cache.
+            self.misses += 1
+            self._build(path, gen, count, seed)
+            self.evict(keep=path)
+            return Corpus(path)
+        self.hits += 1
+        os.utime(path)
+        return corpus
+
+    def _build(self, path: str, gen, count: int, seed: int):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            generate_to(tmp, gen, count, seed)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def entries(self) -> list[tuple[str, int, float]]:
+        # (path, size, last use), least recently used first.
+        out = []
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return out
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            out.append((path, st.st_size, st.st_mtime))
+        return sorted(out, key=lambda e: e[2])
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: str | None = None) -> int:
+        # Removes least recently used entries until the cache fits; returns
+        # the number removed. An open Corpus stays readable after its file
+        # is unlinked.
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.unlink(path)
+
+
+default_cache = CorpusCache()
+
+
+def cached_corpus(gen, count: int, seed: int = 0, cache: CorpusCache | None = None) -> Corpus:
+    return (cache or default_cache).get(gen, count, seed)
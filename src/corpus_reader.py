@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import mmap
+import os
+import sys
+
+import lambda_codec
+import utils
+from cli import broken_pipe_exit, ordered_map
+from lambda_metrics import METRIC_NAMES, term_metrics
+from parse_cache import parse_checked
+
+# Reads text corpora as written by utils.dump_gen (one term per line) or
+# dump_gen_in_alchemy_fmt (the `1` header, then `eval term;` lines). The
+# file is memory-mapped and cut into chunks of about chunk_bytes that end
+# on a newline; each chunk is parsed as a whole, in worker processes when
+# workers > 1, and results come back in file order with at most
+# 2 * workers chunks in flight.
+#
+#   reader = CorpusReader("terms.txt", kind="metrics", workers=8)
+#   for line, metrics in reader.records(): ...
+#   reader.errors    # [(line, message), ...] for lines that did not parse
+#
+# kind is "terms" (ASTNodes), "text" (the term as written, once it has
+# parsed) or "metrics" (term_metrics dicts). Line numbers start at 1 and
+# count every line of the file, header included.
+
+KINDS = ("terms", "text", "metrics")
+
+
+def chunk_bounds(mm, chunk_bytes: int):
+    # (start, end) byte ranges covering mm, each ending after a newline
+    # (or at the end of the file).
+    start = 0
+    size = len(mm)
+    while start < size:
+        end = mm.find(b"\n", min(start + chunk_bytes, size) - 1)
+        end = size if end < 0 else end + 1
+        yield start, end
+        start = end
+
+
+def _read_chunk(path: str, kind: str, encode: bool, bounds) -> tuple[int, list, list]:
+    # (lines in the chunk, [(line, value)], [(line, message)]), lines
+    # counted from 0 within the chunk.
+    start, end = bounds
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode("utf-8", errors="replace")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    values = []
+    errors = []
+    for i, line in enumerate(lines):
+        expr = utils.strip_alchemy_fmt(line)
+        if expr is None:
+            continue
+        ast, message = parse_checked(expr)
+        if ast is None:
+            errors.append((i, message))
+            continue
+        match kind:
+            case "text":
+                values.append((i, expr))
+            case "metrics":
+                values.append((i, term_metrics(ast)))
+            case _:
+                values.append((i, lambda_codec.encode(ast) if encode else ast))
+    return len(lines), values, errors
+
+
+class CorpusReader:
+    def __init__(self, path: str, kind: str = "terms", workers: int = 1,
+                 chunk_bytes: int = 1 << 20, max_errors: int = 1000):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        self.path = path
+        self.kind = kind
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+        self.max_errors = max_errors
+        self.errors: list[tuple[int, str]] = []
+        self.n_errors = 0
+        self.n_lines = 0
+        self.n_values = 0
+
+    def records(self):
+        # (line, value) in file order. Malformed lines are skipped and
+        # recorded in self.errors (the first max_errors of them; n_errors
+        # counts all).
+        self.errors = []
+        self.n_errors = self.n_lines = self.n_values = 0
+        if os.path.getsize(self.path) == 0:
+            return
+        decode = self.workers > 1 and self.kind == "terms"
+        fn = functools.partial(_read_chunk, self.path, self.kind, decode)
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for n_lines, values, errors in ordered_map(fn, chunk_bounds(mm, self.chunk_bytes), self.workers):
+                first = self.n_lines + 1
+                self.n_errors += len(errors)
+                room = self.max_errors - len(self.errors)
+                self.errors.extend((first + i, message) for i, message in errors[:max(room, 0)])
+                self.n_lines += n_lines
+                self.n_values += len(values)
+                for i, value in values:
+                    yield first + i, lambda_codec.decode(value) if decode else value
+
+    def __iter__(self):
+        for _, value in self.records():
+            yield value
+
+
+def read_corpus(path: str, kind: str = "terms", workers: int = 1, chunk_bytes: int = 1 << 20):
+    return iter(CorpusReader(path, kind, workers, chunk_bytes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read a text or AlChemy-format term corpus.")
+    parser.add_argument("path")
+    parser.add_argument("--kind", choices=["text", "metrics"], default="text",
+                        help="write the valid terms, or their metrics as TSV")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    parser.add_argument("--line-numbers", action="store_true")
+    args = parser.parse_args()
+
+    reader = CorpusReader(args.path, args.kind, args.workers, args.chunk_kb << 10)
+    out = sys.stdout
+    try:
+        if args.kind == "metrics":
+            out.write(("line\t" if args.line_numbers else "") + "\t".join(METRIC_NAMES) + "\n")
+        for line, value in reader.records():
+            if args.kind == "metrics":
+                value = "\t".join(str(int(value[k])) for k in METRIC_NAMES)
+            out.write(f"{line}\t{value}\n" if args.line_numbers else f"{value}\n")
+        out.flush()
+    except BrokenPipeError:
+        broken_pipe_exit()
+    for line, message in reader.errors:
+        print(f"{args.path}:{line}: {message}", file=sys.stderr)
+    if reader.n_errors > len(reader.errors):
+        print(f"... {reader.n_errors - len(reader.errors)} more", file=sys.stderr)
+    print(f"{reader.n_values} terms, {reader.n_errors} malformed lines, {reader.n_lines} lines",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
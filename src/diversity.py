@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import argparse
+import math
+import sqlite3
+from collections import deque
+
+# Population diversity of AlChemy series over a sliding window of time
+# steps: Shannon entropy (bits), Simpson diversity 1 - sum p^2, richness
+# (distinct expressions) and turnover (I + E) / (S_prev + S_now), where I
+# and E are the expressions that entered/left the window at this step.
+#
+# A count map of the window is updated in O(1) per row as steps enter and
+# leave, together with running sum(c log c) and sum(c^2), so no window is
+# ever regrouped.
+
+SUMMARY_COLUMNS = (
+    "experiment_id",
+    "series_number",
+    "time_step",
+    "window",
+    "n",
+    "richness",
+    "shannon",
+    "simpson",
+    "turnover",
+)
+
+
+class WindowCounts:
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.n = 0
+        self.c_log_c = 0.0
+        self.c_sq = 0
+        self.entered = 0
+        self.left = 0
+
+    def add(self, expr: str):
+        c = self.counts.get(expr, 0)
+        if c == 0:
+            self.entered += 1
+        else:
+            self.c_log_c -= c * math.log2(c)
+        self.counts[expr] = c + 1
+        self.c_log_c += (c + 1) * math.log2(c + 1)
+        self.c_sq += 2 * c + 1
+        self.n += 1
+
+    def remove(self, expr: str):
+        c = self.counts[expr]
+        self.c_log_c -= c * math.log2(c)
+        self.c_sq -= 2 * c - 1
+        self.n -= 1
+        if c == 1:
+            del self.counts[expr]
+            self.left += 1
+        else:
+            self.counts[expr] = c - 1
+            self.c_log_c += (c - 1) * math.log2(c - 1)
+
+    @property
+    def richness(self) -> int:
+        return len(self.counts)
+
+    def shannon(self) -> float:
+        if self.n == 0:
+            return 0.0
+        # H = log n - sum(c log c) / n; clamp float drift around 0.
+        return max(0.0, math.log2(self.n) - self.c_log_c / self.n)
+
+    def simpson(self) -> float:
+        if self.n == 0:
+            return 0.0
+        return 1.0 - self.c_sq / (self.n * self.n)
+
+
+def windowed_diversity(rows, window: int):
+    # rows: (experiment_id, series_number, time_step, lambda_expression),
+    # ordered by series and then time step. Yields one tuple per time step
+    # in SUMMARY_COLUMNS order.
+    steps: deque[tuple[int, list[str]]] = deque()
+    counts = WindowCounts()
+    series = None
+    current_step = None
+    current: list[str] = []
+
+    def close_step():
+        richness_prev = counts.richness
+        counts.entered = counts.left = 0
+        for expr in current:
+            counts.add(expr)
+        steps.append((current_step, current))
+        while steps and steps[0][0] <= current_step - window:
+            _, old = steps.popleft()
+            for expr in old:
+                counts.remove(expr)
+        denom = richness_prev + counts.richness
+        turnover = (counts.entered + counts.left) / denom if denom else 0.0
+        return (*series, current_step, window, counts.n, counts.richness,
+                counts.shannon(), counts.simpson(), turnover)
+
+    for experiment_id, series_number, time_step, expr in rows:
+        key = (experiment_id, series_number)
+        if key != series or time_step != current_step:
+            if current_step is not None:
+                yield close_step()
+            if key != series:
+                series = key
+                steps.clear()
+                counts = WindowCounts()
+            current_step = time_step
+            current = []
+        current.append(expr)
+    if current_step is not None:
+        yield close_step()
+
+
+def has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def alchemy_rows(conn: sqlite3.Connection, experiment_ids=None):
+    # Streams (experiment_id, series_number, time_step, lambda_expression).
+    # Without a stored time_step column every row is its own time step, as
+    # in the dashboards' ROW_NUMBER() query.
+    where = ""
+    params = ()
+    if experiment_ids is not None:
+        experiment_ids = list(experiment_ids)
+        where = f"WHERE experiment_id IN ({','.join('?' * len(experiment_ids))})"
+        params = tuple(experiment_ids)
+
+    if has_column(conn, "alchemy_data", "time_step"):
+        yield from conn.execute(
+            f"SELECT experiment_id, series_number, time_step, lambda_expression FROM alchemy_data "
+            f"{where} ORDER BY experiment_id, series_number, time_step, id", params)
+        return
+
+    series = None
+    step = 0
+    for experiment_id, series_number, expr in conn.execute(
+            f"SELECT experiment_id, series_number, lambda_expression FROM alchemy_data "
+            f"{where} ORDER BY experiment_id, series_number, id", params):
+        if (experiment_id, series_number) != series:
+            series = (experiment_id, series_number)
+            step = 0
+        step += 1
+        yield experiment_id, series_number, step, expr
+
+
+def write_summary(conn: sqlite3.Connection, records, table: str = "diversity_summary",
+                  batch_size: int = 10000) -> int:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            experiment_id INTEGER,
+            series_number INTEGER,
+            time_step INTEGER,
+            window INTEGER,
+            n INTEGER,
+            richness INTEGER,
+            shannon REAL,
+            simpson REAL,
+            turnover REAL,
+            PRIMARY KEY (experiment_id, series_number, window, time_step)
+        )""")
+    insert = f"INSERT OR REPLACE INTO {table} ({', '.join(SUMMARY_COLUMNS)}) " \
+             f"VALUES ({', '.join('?' * len(SUMMARY_COLUMNS))})"
+    written = 0
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            conn.executemany(insert, batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(insert, batch)
+        written += len(batch)
+    conn.commit()
+    return written
+
+
+def compute_diversity(db: str, window: int, experiment_ids=None,
+                      table: str = "diversity_summary") -> int:
+    # Reads alchemy_data and writes the summary table in the same database,
+    # holding only the current window in memory. One connection does both:
+    # the insert cursor only touches the summary table while the select
+    # cursor streams.
+    conn = sqlite3.connect(db)
+    try:
+        records = windowed_diversity(alchemy_rows(conn, experiment_ids), window)
+        return write_summary(conn, records, table)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Windowed diversity of AlChemy series.")
+    parser.add_argument("--db", default="alchemy_data.db")
+    parser.add_argument("--window", type=int, default=100, help="time steps per window")
+    parser.add_argument("--experiment-id", type=int, action="append", default=None)
+    parser.add_argument("--table", default="diversity_summary")
+    args = parser.parse_args()
+    n = compute_diversity(args.db, args.window, args.experiment_id, args.table)
+    print(f"wrote {n} rows to {args.table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import os
+import random
+import signal
+import sqlite3
+import sys
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import alchemy_store
+import utils
+
+# Runs many evaluator processes at once and streams their results into
+# alchemy_data. Each job is one series: a fresh evaluator process gets the
+# series' `eval term;` script on stdin and its stdout lines (one resulting
+# term each) are inserted under (experiment_id, series_number) as they
+# arrive. `workers` jobs run concurrently.
+#
+# Writing waits on stdin.drain() so a slow evaluator is not flooded, and
+# stdout/stderr are read concurrently with the writes so the evaluator can
+# never block on a full pipe.
+#
+#   python src/evaluator_pool.py --db alchemy_data.db --experiment-id 3 \
+#       --series 16 --terms 1000 --workers 4
+#
+# By default the evaluator is src/stand_in_evaluator.py.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+STAND_IN = [sys.executable, os.path.join(SRC_DIR, "stand_in_evaluator.py")]
+
+
+@dataclass
+class Job:
+    series_number: int
+    expressions: list[str]
+
+
+@dataclass
+class JobResult:
+    series_number: int
+    sent: int = 0
+    received: int = 0
+    returncode: int | None = None
+    stderr: list[str] = field(default_factory=list)
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+class DbSink:
+    # Appends results to alchemy_data. Inserts (which parse and hash every
+    # result) run in a thread, one at a time, off the event loop.
+    def __init__(self, db: str, experiment_id: int):
+        self.conn = sqlite3.connect(db, check_same_thread=False)
+        alchemy_store.ensure_schema(self.conn)
+        self.experiment_id = experiment_id
+        self.lock = asyncio.Lock()
+        self.inserted = 0
+
+    def _insert(self, series_number: int, expressions: list[str]):
+        alchemy_store.insert_terms(self.conn, self.experiment_id, series_number, expressions)
+        self.conn.commit()
+
+    async def __call__(self, series_number: int, expressions: list[str]):
+        async with self.lock:
+            await asyncio.to_thread(self._insert, series_number, expressions)
+            self.inserted += len(expressions)
+
+    def close(self):
+        self.conn.close()
+
+
+async def _feed(proc, job: Job, result: JobResult, chunk: int):
+    stdin = proc.stdin
+    try:
+        stdin.write(b"1\n\n")
+        for i, expr in enumerate(job.expressions, 1):
+            if stdin.is_closing():
+                # A failed write closed the pipe; writing on would only
+                # log a warning per line until the next drain.
+                break
+            stdin.write(f"eval {expr};\n".encode())
+            result.sent += 1
+            if i % chunk == 0:
+                await stdin.drain()
+        await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # The evaluator exited early; its return code tells why.
+        pass
+    finally:
+        stdin.close()
+
+
+async def _collect(proc, job: Job, result: JobResult, sink, insert_batch: int, batch: list):
+    # batch belongs to the caller, so results read before a timeout can
+    # still be inserted.
+    while line := await proc.stdout.readline():
+        expr = utils.strip_alchemy_fmt(line.decode())
+        if expr is None:
+            continue
+        batch.append(expr)
+        result.received += 1
+        if len(batch) >= insert_batch:
+            full = batch[:]
+            batch.clear()
+            await sink(job.series_number, full)
+
+
+async def _drain_stderr(proc, result: JobResult, keep: int = 20):
+    tail = collections.deque(maxlen=keep)
+    while line := await proc.stderr.readline():
+        tail.append(line.decode(errors="replace").rstrip())
+    result.stderr = list(tail)
+
+
+async def run_job(command: list[str], job: Job, sink, insert_batch: int = 500,
+                  chunk: int = 256, timeout: float | None = None) -> JobResult:
+    result = JobResult(job.series_number)
+    batch = []
+    proc = await asyncio.create_subprocess_exec(
+        *command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE, start_new_session=True)
+    io = asyncio.gather(_feed(proc, job, result, chunk),
+                        _collect(proc, job, result, sink, insert_batch, batch),
+                        _drain_stderr(proc, result))
+    try:
+        await asyncio.wait_for(io, timeout)
+    except asyncio.TimeoutError:
+        result.timed_out = True
+        # Kill the whole process group: a child the evaluator started
+        # would otherwise keep the pipes, and proc.wait(), open.
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGKILL)
+        await proc.wait()
+        # Let the cancelled readers and writer finish so the pipe
+        # transports close while the loop is still running.
+        with contextlib.suppress(asyncio.CancelledError):
+            await io
+    if batch:
+        await sink(job.series_number, batch)
+    result.returncode = await proc.wait()
+    return result
+
+
+async def run_jobs(command: list[str], jobs, sink, workers: int = 4, **kwargs) -> list[JobResult]:
+    # jobs may be a lazy iterable; it is consumed as workers become free.
+    jobs = iter(jobs)
+    results = []
+
+    async def worker():
+        for job in jobs:
+            results.append(await run_job(command, job, sink, **kwargs))
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return sorted(results, key=lambda r: r.series_number)
+
+
+def generated_jobs(gen, n_series: int, terms: int, first_series: int = 0, seed: int | None = None):
+    # One job per series, seeded per series like cli.py's batches.
+    for i in range(n_series):
+        if seed is not None:
+            random.seed(seed + i)
+            np.random.seed((seed + i) % 2**32)
+        yield Job(first_series + i, [gen.random_tree().tolambda() for _ in range(terms)])
+
+
+def main():
+    from cli import make_generator
+
+    parser = argparse.ArgumentParser(description="Run evaluator processes and ingest their output.")
+    parser.add_argument("--db", default="alchemy_data.db")
+    parser.add_argument("--experiment-id", type=int, required=True)
+    parser.add_argument("--series", type=int, default=1, help="number of series (jobs)")
+    parser.add_argument("--first-series", type=int, default=0)
+    parser.add_argument("--terms", type=int, default=1000, help="terms per series")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent evaluator processes")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per job")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-g", "--generator", choices=["btree", "fontana"], default="btree")
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--freevar-p", type=float, default=0.2)
+    parser.add_argument("--max-free-vars", type=int, default=6)
+    parser.add_argument("--std", choices=["prefix", "postfix"], default="prefix")
+    parser.add_argument("--max-depth", type=int, default=10)
+    parser.add_argument("--max-nvars", type=int, default=6)
+    parser.add_argument("evaluator", nargs=argparse.REMAINDER,
+                        help="evaluator command (default: the stand-in evaluator)")
+    args = parser.parse_args()
+
+    command = [c for c in args.evaluator if c != "--"] or STAND_IN
+    jobs = generated_jobs(make_generator(args), args.series, args.terms, args.first_series, args.seed)
+    sink = DbSink(args.db, args.experiment_id)
+    try:
+        results = asyncio.run(run_jobs(command, jobs, sink, args.workers, timeout=args.timeout))
+    finally:
+        sink.close()
+    failed = [r for r in results if not r.ok]
+    for r in failed:
+        reason = "timed out" if r.timed_out else f"exit {r.returncode}"
+        print(f"series {r.series_number}: {reason}: {' / '.join(r.stderr[-3:])}", file=sys.stderr)
+    print(f"{len(results)} series, {sum(r.sent for r in results)} terms sent, "
+          f"{sink.inserted} results inserted")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,13 @@ from lambda_ast import ASTNode
 
 import random
 
+import instrument
+from rng import LegacyRNG
 import utils
 
 class Urn:
-    # RNG used in Fontana's original generator. This is currently unused.
+    # RNG used in Fontana's original generator, one draw at a time. Kept as
+    # the reference for rng.MinStdRNG, which produces the same stream.
     A = 48271
     M = 2147483647
     Q = M // A
@@ -21,7 +24,7 @@ class Urn:
         hi = self.seed // self.Q
         lo = self.seed % self.Q
         test = self.A * lo - self.R * hi
-        self.seed = self.test if test > 0 else test + self.M
+        self.seed = test if test > 0 else test + self.M
         return self.seed * self.temp
 
 
@@ -30,7 +33,8 @@ class FontanaGen:
                  max_depth=10,
                  max_nvars=6,
                  application_prange=(0.3, 0.5),
-                 abstraction_prange=(0.5, 0.3)):
+                 abstraction_prange=(0.5, 0.3),
+                 rng=None):
         #  self.variables = list("abcdefghijklmnopqrstuvwzyz")
         self.variables = [f"x{i}" for i in range(26)]
         self.max_depth = max_depth
@@ -39,6 +43,8 @@ class FontanaGen:
         self.abstraction_prange = abstraction_prange
         self.application_incr = self.get_application_incr()
         self.abstraction_incr = self.get_abstraction_incr()
+        # Any rng.py backend; the default draws from the global random state.
+        self.rng = rng if rng is not None else LegacyRNG()
 
     def set_application_prange(self, start: float, end: float) -> FontanaGen:
         self.application_prange = (start, end)
@@ -75,18 +81,23 @@ class FontanaGen:
                              depth: int,
                              p_abstraction: float,
                              p_application: float) -> ASTNode:
+        if instrument.enabled:
+            instrument.count("fontana.nodes")
+            instrument.record_max("fontana.recursion_depth", depth)
         if depth > self.max_depth:
-            var = self.variables[random.randint(0, self.max_nvars)]
+            if instrument.enabled:
+                instrument.count("fontana.depth_cutoffs")
+            var = self.variables[self.rng.randint(0, self.max_nvars)]
             return ASTNode(None, None).set_value(var)
 
-        coin = random.random()
+        coin = self.rng.random()
 
         n_abst = p_abstraction + self.application_incr
         n_appl = p_application + self.abstraction_incr
 
         if coin <= p_abstraction:
             left_child = self.random_lambda_helper(depth + 1, n_abst, n_appl)
-            var = self.variables[random.randint(0, self.max_nvars)]
+            var = self.variables[self.rng.randint(0, self.max_nvars)]
             return ASTNode(left_child, None).set_value(var)
 
         elif coin <= p_abstraction + p_application:
@@ -95,19 +106,29 @@ class FontanaGen:
             return ASTNode(left_child, right_child)
 
         else:
-            var = self.variables[random.randint(0, self.max_nvars)]
+            var = self.variables[self.rng.randint(0, self.max_nvars)]
             return ASTNode(None, None).set_value(var)
 
     def random_lambda(self):
         init_p_abst = self.abstraction_prange[0]
         init_p_appl = self.application_prange[0]
+        clock = instrument.clock()
         ast = self.random_lambda_helper(0, init_p_abst, init_p_appl)
-        return ast.tolambda()
+        clock.lap("fontana.generate")
+        s = ast.tolambda()
+        clock.lap("fontana.tolambda")
+        if instrument.enabled:
+            instrument.count("fontana.trees")
+        return s
 
     def random_tree(self):
         init_p_abst = self.abstraction_prange[0]
         init_p_appl = self.application_prange[0]
+        clock = instrument.clock()
         ast = self.random_lambda_helper(0, init_p_abst, init_p_appl)
+        clock.lap("fontana.generate")
+        if instrument.enabled:
+            instrument.count("fontana.trees")
         return ast
 
 
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+from lambda_ast import ASTNode
+from lambda_canon import binder_prefix, free_variables
+from lambda_eval import OutOfFuel
+
+# Call-by-need graph reduction by template instantiation. A term becomes a
+# mutable graph of Nodes; beta-reducing (\x.body) arg copies the body with
+# every x pointing at the one shared arg node, and the redex node is then
+# overwritten with an indirection to the result. An argument is therefore
+# reduced at most once however many times it is used, and a term like
+# (\x0.(x0)x0) grows as a graph instead of doubling as a tree.
+#
+# Nodes that mention no variable bound outside themselves are flagged
+# closed; instantiation shares them instead of copying (so combinators
+# inside a body are built once), and only closed nodes are ever reduced
+# in place.
+#
+# Reduction runs to weak head normal form on an explicit spine stack;
+# readback() evaluates under binders by instantiating them with fresh free
+# variables, like lambda_eval.reify, and names binders prefix0, prefix1, ...
+# by nesting level. Beta steps and allocated nodes are budgeted: running
+# out raises OutOfFuel or its subclass OutOfMemory.
+
+FREE = 0
+VAR = 1
+LAM = 2
+APP = 3
+IND = 4
+
+
+class OutOfMemory(OutOfFuel):
+    pass
+
+
+class Node:
+    # FREE: a = name. VAR: a = name. LAM: a = its VAR node, b = body.
+    # APP: a = function, b = argument. IND: a = target.
+    __slots__ = ("tag", "a", "b", "closed")
+
+    def __init__(self, tag: int, a=None, b=None, closed: bool = False):
+        self.tag = tag
+        self.a = a
+        self.b = b
+        self.closed = closed
+
+
+@dataclass
+class Stats:
+    steps: int = 0
+    allocated: int = 0
+    substitutions: int = 0
+    shared: int = 0
+    closed_skips: int = 0
+    updates: int = 0
+    indirections: int = 0
+    output_nodes: int = 0
+
+
+class GraphReducer:
+    def __init__(self, max_steps: int = 10000, max_nodes: int = 1_000_000):
+        self.max_steps = max_steps
+        self.max_nodes = max_nodes
+        self.stats = Stats()
+
+    def _alloc(self, tag: int, a=None, b=None, closed: bool = False) -> Node:
+        stats = self.stats
+        if stats.allocated >= self.max_nodes:
+            raise OutOfMemory(f"{stats.allocated} graph nodes allocated after {stats.steps} steps")
+        stats.allocated += 1
+        return Node(tag, a, b, closed)
+
+    def _follow(self, node: Node) -> Node:
+        while node.tag == IND:
+            self.stats.indirections += 1
+            node = node.a
+        return node
+
+    def graph(self, ast: ASTNode) -> Node:
+        # Converts an ASTNode; a node is closed if every variable it uses is
+        # bound inside it, i.e. its lowest referenced binder level is at
+        # least its own nesting level.
+        free: dict[str, Node] = {}
+        binders: dict[str, list[Node]] = {}
+        levels: dict[int, int] = {}
+        results = []
+        stack = [(ast, 0, False)]
+        while stack:
+            node, level, expanded = stack.pop()
+            match node.left, node.right:
+                case (None, None):
+                    vars = binders.get(node.value)
+                    if vars:
+                        var = vars[-1]
+                        results.append((var, levels[id(var)]))
+                    else:
+                        if node.value not in free:
+                            free[node.value] = self._alloc(FREE, node.value, closed=True)
+                        results.append((free[node.value], math.inf))
+                case (None, body) | (body, None):
+                    if not expanded:
+                        var = self._alloc(VAR, node.value)
+                        levels[id(var)] = level
+                        binders.setdefault(node.value, []).append(var)
+                        stack.append((node, level, True))
+                        stack.append((body, level + 1, False))
+                        continue
+                    var = binders[node.value].pop()
+                    body, ref = results.pop()
+                    results.append((self._alloc(LAM, var, body, closed=ref >= level), ref))
+                case (left, right):
+                    if not expanded:
+                        stack.append((node, level, True))
+                        stack.append((right, level, False))
+                        stack.append((left, level, False))
+                        continue
+                    arg, arg_ref = results.pop()
+                    fn, fn_ref = results.pop()
+                    ref = min(fn_ref, arg_ref)
+                    results.append((self._alloc(APP, fn, arg, closed=ref >= level), ref))
+        return results.pop()[0]
+
+    def _instantiate(self, body: Node, var: Node, arg: Node) -> Node:
+        # body with var replaced by arg. Unchanged subgraphs are returned as
+        # they are, and sharing inside body is kept.
+        stats = self.stats
+        follow = self._follow
+        memo: dict[int, Node] = {}
+        uses = 0
+        stack = [(body, False)]
+        while stack:
+            node, expanded = stack.pop()
+            node = follow(node)
+            key = id(node)
+            if not expanded:
+                if key in memo:
+                    if node is var:
+                        uses += 1
+                    continue
+                if node.closed:
+                    stats.closed_skips += 1
+                    memo[key] = node
+                    continue
+            tag = node.tag
+            if tag == VAR:
+                if node is var:
+                    uses += 1
+                    memo[key] = arg
+                else:
+                    memo[key] = node
+            elif tag == LAM:
+                if node.a is var:
+                    # Shadowed; cannot happen for a well-formed graph.
+                    memo[key] = node
+                elif not expanded:
+                    stack.append((node, True))
+                    stack.append((node.b, False))
+                else:
+                    b = memo[id(follow(node.b))]
+                    memo[key] = node if b is node.b else self._alloc(LAM, node.a, b)
+            elif tag == APP:
+                if not expanded:
+                    stack.append((node, True))
+                    stack.append((node.b, False))
+                    stack.append((node.a, False))
+                else:
+                    a = memo[id(follow(node.a))]
+                    b = memo[id(follow(node.b))]
+                    if a is node.a and b is node.b:
+                        memo[key] = node
+                    else:
+                        memo[key] = self._alloc(APP, a, b, closed=a.closed and b.closed)
+            else:
+                memo[key] = node
+        if uses:
+            stats.substitutions += uses
+            stats.shared += uses - 1
+        return memo[id(follow(body))]
+
+    def _beta(self, lam: Node, arg: Node) -> Node:
+        stats = self.stats
+        if stats.steps >= self.max_steps:
+            raise OutOfFuel(f"out of fuel after {stats.steps} steps")
+        stats.steps += 1
+        # Arguments reaching a redex at the top level never refer to
+        # binders outside themselves.
+        arg.closed = True
+        return self._instantiate(lam.b, lam.a, arg)
+
+    def whnf(self, node: Node) -> Node:
+        # Reduces node to weak head normal form, updating every redex on
+        # the way so shared references see the result.
+        follow = self._follow
+        spine = []
+        root = node
+        while True:
+            node = follow(node)
+            if node.tag == APP:
+                spine.append(node)
+                node = node.a
+            elif node.tag == LAM and spine:
+                redex = spine.pop()
+                result = self._beta(node, redex.b)
+                redex.tag = IND
+                redex.a = result
+                redex.b = None
+                self.stats.updates += 1
+                node = result
+            else:
+                return follow(root)
+
+    def readback(self, node: Node, prefix: str = "x") -> ASTNode:
+        # Full normal form of node as an ASTNode. The output is a tree, so
+        # its nodes count against max_nodes too.
+        stats = self.stats
+        results = []
+        stack = [("eval", node, 0)]
+        while stack:
+            task, value, level = stack.pop()
+            match task:
+                case "eval":
+                    value = self.whnf(value)
+                    if value.tag == LAM:
+                        name = f"{prefix}{level}"
+                        fresh = self._alloc(FREE, name, closed=True)
+                        body = self._beta(value, fresh)
+                        stack.append(("lam", name, level))
+                        stack.append(("eval", body, level + 1))
+                        continue
+                    args = []
+                    while value.tag == APP:
+                        args.append(value.b)
+                        value = self._follow(value.a)
+                    stack.append(("app", (value.a, len(args)), level))
+                    stack.extend(("eval", arg, level) for arg in args)
+                case "lam":
+                    body = results.pop()
+                    results.append(ASTNode(body, None).set_value(value))
+                    stats.output_nodes += 1
+                case "app":
+                    head, n = value
+                    out = ASTNode(None, None).set_value(head)
+                    # Arguments were evaluated first to last.
+                    if n:
+                        for arg in results[-n:]:
+                            out = ASTNode(out, arg)
+                        del results[-n:]
+                    results.append(out)
+                    stats.output_nodes += n + 1
+            if stats.output_nodes > self.max_nodes:
+                raise OutOfMemory(f"normal form larger than {self.max_nodes} nodes")
+        return results.pop()
+
+    def normalize(self, ast: ASTNode) -> ASTNode:
+        return self.readback(self.graph(ast), binder_prefix(free_variables(ast)))
+
+
+def normalize(ast: ASTNode, fuel: int = 10000, max_nodes: int = 1_000_000) -> ASTNode:
+    # Drop-in for lambda_eval.normalize with a memory budget.
+    return GraphReducer(fuel, max_nodes).normalize(ast)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+
+# Opt-in counters and stage timers for the generators, the lexer/parser and
+# the dump loops. Everything is off unless enable() is called (or
+# LAMBDA_INSTRUMENT=1 is set); instrumented code checks `instrument.enabled`
+# or gets the no-op clock, so the disabled cost is an attribute lookup.
+#
+#   instrument.enable()
+#   with instrument.Emitter(10):          # stats to stderr every 10 s
+#       utils.dump_gen(gen, 10**7)
+#   print(instrument.report())
+#
+# State is per process: pool workers keep their own counts.
+
+enabled = os.environ.get("LAMBDA_INSTRUMENT", "") not in ("", "0")
+
+counters: dict[str, int] = {}
+maxima: dict[str, int] = {}
+seconds: dict[str, float] = {}
+calls: dict[str, int] = {}
+started = time.perf_counter()
+
+
+def enable(flag: bool = True):
+    global enabled
+    enabled = flag
+
+
+def disable():
+    enable(False)
+
+
+def reset():
+    global started
+    counters.clear()
+    maxima.clear()
+    seconds.clear()
+    calls.clear()
+    started = time.perf_counter()
+
+
+def count(name: str, n: int = 1):
+    counters[name] = counters.get(name, 0) + n
+
+
+def record_max(name: str, value: int):
+    if value > maxima.get(name, value - 1):
+        maxima[name] = value
+
+
+def add_time(name: str, elapsed: float):
+    seconds[name] = seconds.get(name, 0.0) + elapsed
+    calls[name] = calls.get(name, 0) + 1
+
+
+class Clock:
+    # Attributes the time since the previous lap (or creation) to a stage.
+    __slots__ = ("last",)
+
+    def __init__(self):
+        self.last = time.perf_counter()
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        add_time(name, now - self.last)
+        self.last = now
+
+
+class _NullClock:
+    __slots__ = ()
+
+    def lap(self, name: str):
+        pass
+
+
+NULL_CLOCK = _NullClock()
+
+
+def clock():
+    return Clock() if enabled else NULL_CLOCK
+
+
+def snapshot() -> dict:
+    return {
+        "elapsed": time.perf_counter() - started,
+        "counters": dict(counters),
+        "maxima": dict(maxima),
+        "timers": {name: {"seconds": s, "calls": calls.get(name, 0)} for name, s in dict(seconds).items()},
+    }
+
+
+def report(snap: dict | None = None) -> str:
+    snap = snapshot() if snap is None else snap
+    lines = [f"elapsed {snap['elapsed']:.2f} s"]
+    for name, t in sorted(snap["timers"].items(), key=lambda kv: -kv[1]["seconds"]):
+        per_call = t["seconds"] / t["calls"] * 1e6 if t["calls"] else 0.0
+        lines.append(f"  {name:28s} {t['seconds']:10.3f} s {t['calls']:12d} calls {per_call:10.2f} us/call")
+    for name, n in sorted(snap["counters"].items()):
+        lines.append(f"  {name:28s} {n:12d}")
+    for name, n in sorted(snap["maxima"].items()):
+        lines.append(f"  {name:28s} max {n}")
+    return "\n".join(lines)
+
+
+class Emitter:
+    # Writes a report (or JSON snapshot) to `sink` every `interval` seconds
+    # from a daemon thread, and once more on stop().
+    def __init__(self, interval: float = 10.0, sink=None, as_json: bool = False):
+        self.interval = interval
+        self.sink = sink
+        self.as_json = as_json
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def emit(self):
+        sink = self.sink or sys.stderr
+        snap = snapshot()
+        sink.write((json.dumps(snap) if self.as_json else report(snap)) + "\n")
+        sink.flush()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.emit()
+
+    def start(self) -> Emitter:
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.emit()
+
+    def __enter__(self) -> Emitter:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
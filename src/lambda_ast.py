@@ -1,8 +1,10 @@
 from __future__ import annotations
-# from ete3 import Tree
 import collections
 import enum
 
+from lambda_traverse import count_kinds, fold, preorder
+
+
 class NodeType(enum.Enum):
     Application = 0
     Abstraction = 1
@@ -113,86 +115,149 @@ class ASTNode:
                     queue.append(child)
 
     def tolambda(self) -> str:
-        match self.left, self.right:
-            case (None, None):
-                return f"{self.value}"
-            case (None, _):
-                body = self.right.tolambda()
-                return f"\\{self.value}.{body}"
-            case (_, None):
-                body = self.left.tolambda()
-                return f"\\{self.value}.{body}"
-            case (_, _):
-                l_lambda = self.left.tolambda()
-                r_lambda = self.right.tolambda()
-                return f"({l_lambda}){r_lambda}"
+        return "".join(self.iter_lambda())
+
+    def write_lambda(self, sink, chunk_size: int = 1 << 16) -> int:
+        # Streams tolambda() into anything with a write(str) method (file,
+        # io.StringIO, socket.makefile(...)) and returns the characters written.
+        written = 0
+        for chunk in self.iter_lambda(chunk_size):
+            sink.write(chunk)
+            written += len(chunk)
+        return written
+
+    def iter_lambda(self, chunk_size: int = 1 << 16):
+        # Explicit-stack serializer, yields the lambda string in chunks of
+        # roughly chunk_size characters. Strings on the stack are pending
+        # closing braces.
+        pieces = []
+        size = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                piece = node
+            else:
+                match node.left, node.right:
+                    case (None, None):
+                        piece = f"{node.value}"
+                    case (None, _):
+                        piece = f"\\{node.value}."
+                        stack.append(node.right)
+                    case (_, None):
+                        piece = f"\\{node.value}."
+                        stack.append(node.left)
+                    case (_, _):
+                        piece = "("
+                        stack.append(node.right)
+                        stack.append(")")
+                        stack.append(node.left)
+            pieces.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield "".join(pieces)
+                pieces = []
+                size = 0
+        if pieces:
+            yield "".join(pieces)
+
+    def iter_ascii(self, max_indent: int | None = None):
+        # Line-by-line outline of the tree ("@" marks an application).
+        # Memory is bounded by the depth of the tree, not its size, so this
+        # works for trees far too large for display(). Past max_indent
+        # levels the guides are collapsed into a "[depth]" marker.
+        guides = []
+        stack = [(self, 0, True)]
+        while stack:
+            node, depth, is_last = stack.pop()
+            del guides[max(depth - 1, 0):]
+            match node.left, node.right:
+                case (None, None):
+                    label = f"{node.value}"
+                    children = ()
+                case (None, _):
+                    label = f"\\{node.value}"
+                    children = (node.right,)
+                case (_, None):
+                    label = f"\\{node.value}"
+                    children = (node.left,)
+                case (_, _):
+                    label = "@"
+                    children = (node.left, node.right)
+
+            if depth == 0:
+                yield label
+            else:
+                branch = "`-- " if is_last else "|-- "
+                if max_indent is not None and depth > max_indent:
+                    hidden = depth - max_indent
+                    yield f"[{hidden}] " + "".join(guides[hidden:]) + branch + label
+                else:
+                    yield "".join(guides) + branch + label
+                guides.append("    " if is_last else "|   ")
+
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i], depth + 1, i == len(children) - 1))
 
+    def write_ascii(self, sink, max_indent: int | None = None) -> int:
+        lines = 0
+        for line in self.iter_ascii(max_indent):
+            sink.write(line)
+            sink.write("\n")
+            lines += 1
+        return lines
+
+    # These two have always counted each other's node kind (an abstraction
+    # is the one-child case); the numbers are kept as they were so existing
+    # plots stay comparable.
     def n_applications(self):
-        match self.left, self.right:
-            case (None, None):
-                return 0
-            case (_, None):
-                return self.left.n_applications() + 1
-            case (None, _):
-                return self.right.n_applications() + 1
-            case (_, _):
-                return self.right.n_applications() + self.left.n_applications()
+        _, abstractions, _ = count_kinds(self)
+        return abstractions
 
     def n_abstractions(self):
-        match self.left, self.right:
-            case (None, None):
-                return 0
-            case (_, None):
-                return self.left.n_abstractions()
-            case (None, _):
-                return self.right.n_abstractions()
-            case (_, _):
-                return self.right.n_abstractions() + self.left.n_abstractions() + 1
+        _, _, applications = count_kinds(self)
+        return applications
 
     def to_ete3(self):
-        match self.left, self.right:
-            case (None, None):
-                return Tree(f"{self.value}:1.0;")
-            case (None, _):
-                body = self.right.to_ete3()
-                t = Tree(f"λ{self.value}:1.0;")
-                t.add_child(body)
-                return t
-            case (_, None):
-                body = self.left.to_ete3()
-                t = Tree(f"λ{self.value}:1.0;")
-                t.add_child(body)
-                return t
-            case (_, _):
-                lt = self.left.to_ete3()
-                rt = self.right.to_ete3()
-                t = Tree(":1.0;")
-                t.add_child(lt)
-                t.add_child(rt)
-                return t
-    
-    def must_have_free_variables(self):
-        match self.left, self.right:
-            case (None, None):
-                return True
-            case (None, _) | (_, None):
-                return False
-            case (_, _):
-                return self.left.must_have_free_variables() \
-                    or self.right.must_have_free_variables()
+        from ete3 import Tree
+
+        # Nodes are built directly rather than by parsing one Newick string
+        # per node.
+        def leaf(node):
+            return Tree(name=f"{node.value}", dist=1.0)
+
+        def abstraction(node, body):
+            t = Tree(name=f"λ{node.value}", dist=1.0)
+            t.add_child(body)
+            return t
 
+        def application(node, lt, rt):
+            t = Tree(name="", dist=1.0)
+            t.add_child(lt)
+            t.add_child(rt)
+            return t
+
+        return fold(self, leaf, abstraction, application)
+
+    def must_have_free_variables(self):
+        # True if some leaf is reachable from the root through applications
+        # only, i.e. without passing under any binder.
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            match node.left, node.right:
+                case (None, None):
+                    return True
+                case (None, _) | (_, None):
+                    pass
+                case (left, right):
+                    stack.append(right)
+                    stack.append(left)
+        return False
 
     def search_for_value(self, value):
-        match self.left, self.right:
-            case (None, None):
-                return self.value == value
-            case (None, _):
-                return self.right.search_for_value(value)
-            case (_, None):
-                return self.left.search_for_value(value)
-            case (_, _):
-                return self.right.search_for_value(value) \
-                       or self.left.search_for_value(value)
+        return any(node.left is None and node.right is None and node.value == value
+                   for node in preorder(self))
 
 
 
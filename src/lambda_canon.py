@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from functools import lru_cache
+
+from lambda_ast import ASTNode
+
+# Alpha-invariant views of a term. Bound variables are identified by their
+# de Bruijn index (distance to their binder), free variables by name.
+
+MASK = (1 << 64) - 1
+
+APP_TAG = 0x61707031
+ABS_TAG = 0x61627331
+BOUND_TAG = 0x626e6431
+FREE_TAG = 0x66726531
+
+
+def _mix(h: int) -> int:
+    # splitmix64 finalizer
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & MASK
+    return h ^ (h >> 31)
+
+
+def _combine(tag: int, a: int, b: int = 0) -> int:
+    return _mix((_mix(tag ^ a) * 0x9E3779B97F4A7C15 + b) & MASK)
+
+
+@lru_cache(maxsize=4096)
+def _name_hash(name: str) -> int:
+    # Process-independent, unlike hash(str).
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def debruijn_hashes(ast: ASTNode, emit=None) -> int:
+    # 64-bit structural hash of the term up to renaming of bound variables.
+    # The hash of every subterm is computed on the way (bottom-up, one
+    # pass); emit(node, h) is called for each of them in post-order. A
+    # subterm's hash depends on how far away the binders of its free
+    # de Bruijn indices are, not on their names.
+    binders: dict[str, list[int]] = {}
+    level = 0
+    results = []
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        match node.left, node.right:
+            case (None, None):
+                levels = binders.get(node.value)
+                if levels:
+                    h = _combine(BOUND_TAG, level - levels[-1] - 1)
+                else:
+                    h = _combine(FREE_TAG, _name_hash(node.value))
+            case (None, body) | (body, None):
+                if not expanded:
+                    binders.setdefault(node.value, []).append(level)
+                    level += 1
+                    stack.append((node, True))
+                    stack.append((body, False))
+                    continue
+                level -= 1
+                binders[node.value].pop()
+                h = _combine(ABS_TAG, results.pop())
+            case (left, right):
+                if not expanded:
+                    stack.append((node, True))
+                    stack.append((right, False))
+                    stack.append((left, False))
+                    continue
+                r = results.pop()
+                h = _combine(APP_TAG, results.pop(), r)
+        if emit is not None:
+            emit(node, h)
+        results.append(h)
+    return results.pop()
+
+
+def canonical_hash(ast: ASTNode) -> int:
+    return debruijn_hashes(ast)
+
+
+def free_variables(ast: ASTNode) -> set[str]:
+    bound: dict[str, int] = {}
+    free = set()
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        match node.left, node.right:
+            case (None, None):
+                if not bound.get(node.value):
+                    free.add(node.value)
+            case (None, body) | (body, None):
+                if expanded:
+                    bound[node.value] -= 1
+                else:
+                    bound[node.value] = bound.get(node.value, 0) + 1
+                    stack.append((node, True))
+                    stack.append((body, False))
+            case (left, right):
+                stack.append((right, False))
+                stack.append((left, False))
+    return free
+
+
+def binder_prefix(free: set[str]) -> str:
+    # First prefix whose numbered names cannot capture a free variable.
+    for prefix in ("x", "y", "z", "v", "w"):
+        pattern = re.compile(rf"{prefix}\d+")
+        if not any(pattern.fullmatch(name) for name in free):
+            return prefix
+    prefix = "v"
+    while any(name.startswith(prefix) for name in free):
+        prefix += "v"
+    return prefix
+
+
+def canonicalize(ast: ASTNode) -> ASTNode:
+    # Returns a fresh copy with every binder renamed after its nesting level
+    # (x0 outermost), so alpha-equivalent terms become identical strings.
+    # Free variables keep their names; binders that bind nothing are still
+    # renamed.
+    prefix = binder_prefix(free_variables(ast))
+    binders: dict[str, list[int]] = {}
+    level = 0
+    results = []
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        match node.left, node.right:
+            case (None, None):
+                levels = binders.get(node.value)
+                value = f"{prefix}{levels[-1]}" if levels else node.value
+                out = ASTNode(None, None).set_value(value)
+            case (None, body) | (body, None):
+                if not expanded:
+                    binders.setdefault(node.value, []).append(level)
+                    level += 1
+                    stack.append((node, True))
+                    stack.append((body, False))
+                    continue
+                level -= 1
+                binders[node.value].pop()
+                out = ASTNode(results.pop(), None).set_value(f"{prefix}{level}")
+            case (left, right):
+                if not expanded:
+                    stack.append((node, True))
+                    stack.append((right, False))
+                    stack.append((left, False))
+                    continue
+                r = results.pop()
+                out = ASTNode(results.pop(), r)
+        results.append(out)
+    return results.pop()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from lambda_ast import ASTNode
+
+# Binary form of a term: a symbol table followed by a pre-order opcode
+# stream. Every opcode is a single varint `(symbol << 2) | kind`, so an
+# application costs one byte and a variable or binder usually costs one or
+# two.
+#
+#   term    := n_symbols symbol* opcode*
+#   symbol  := len utf8-bytes
+#   opcode  := varint
+#
+# ABS is an abstraction with its body on the left, the shape the parser
+# and generators build; ABS_RIGHT keeps a body stored on the right, so
+# either shape decodes as it was encoded.
+APP = 0
+ABS = 1
+VAR = 2
+ABS_RIGHT = 3
+
+
+def write_varint(buf: bytearray, n: int):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def read_varint(data, pos: int) -> tuple[int, int]:
+    n = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def encode(ast: ASTNode) -> bytes:
+    symbols: dict[str, int] = {}
+    ops = bytearray()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        match node.left, node.right:
+            case (None, None):
+                sym = symbols.setdefault(node.value, len(symbols))
+                write_varint(ops, (sym << 2) | VAR)
+            case (_, None):
+                sym = symbols.setdefault(node.value, len(symbols))
+                write_varint(ops, (sym << 2) | ABS)
+                stack.append(node.left)
+            case (None, _):
+                sym = symbols.setdefault(node.value, len(symbols))
+                write_varint(ops, (sym << 2) | ABS_RIGHT)
+                stack.append(node.right)
+            case (_, _):
+                ops.append(APP)
+                stack.append(node.right)
+                stack.append(node.left)
+
+    out = bytearray()
+    write_varint(out, len(symbols))
+    for name in symbols:
+        raw = name.encode("utf-8")
+        write_varint(out, len(raw))
+        out += raw
+    out += ops
+    return bytes(out)
+
+
+def decode(data, start: int = 0, end: int | None = None) -> ASTNode:
+    if end is None:
+        end = len(data)
+    pos = start
+    n_symbols, pos = read_varint(data, pos)
+    symbols = []
+    for _ in range(n_symbols):
+        length, pos = read_varint(data, pos)
+        symbols.append(bytes(data[pos:pos + length]).decode("utf-8"))
+        pos += length
+
+    root = None
+    # Nodes still waiting for children, with the opcode kind that made them.
+    pending: list[tuple[ASTNode, int]] = []
+    while pos < end:
+        op, pos = read_varint(data, pos)
+        kind = op & 3
+        if kind == APP:
+            node = ASTNode(None, None)
+        else:
+            node = ASTNode(None, None).set_value(symbols[op >> 2])
+
+        if pending:
+            parent, parent_kind = pending[-1]
+            if parent_kind == APP and parent.left is None:
+                parent.left = node
+            elif parent_kind in (APP, ABS_RIGHT):
+                parent.right = node
+                pending.pop()
+            else:
+                parent.left = node
+                pending.pop()
+        elif root is None:
+            root = node
+        else:
+            raise ValueError("trailing opcodes after a complete term")
+
+        if kind != VAR:
+            pending.append((node, kind))
+
+    if root is None or pending:
+        raise ValueError("truncated term")
+    return root
+
+
+def write_record(stream, blob: bytes):
+    # Length-prefixed framing for binary term streams (pipes, sockets).
+    head = bytearray()
+    write_varint(head, len(blob))
+    stream.write(head)
+    stream.write(blob)
+
+
+def read_records(stream):
+    while True:
+        n = 0
+        shift = 0
+        while True:
+            b = stream.read(1)
+            if not b:
+                if shift:
+                    raise ValueError("truncated record header")
+                return
+            n |= (b[0] & 0x7F) << shift
+            if b[0] < 0x80:
+                break
+            shift += 7
+        blob = stream.read(n)
+        if len(blob) != n:
+            raise ValueError("truncated record")
+        yield blob
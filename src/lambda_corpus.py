@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+from lambda_ast import ASTNode
+import lambda_codec
+
+# Corpus file layout:
+#
+#   header  := MAGIC
+#   records := encoded term*                 (see lambda_codec)
+#   index   := uint64 offset * (count + 1)   (little endian, last = end)
+#   trailer := uint64 index_offset, uint64 count, INDEX_MAGIC
+#
+# Records are addressed through the index only, so the file can be mmap'ed
+# and term i decoded without touching any other record.
+MAGIC = b"LBTCORP1"
+INDEX_MAGIC = b"LBTINDX1"
+TRAILER = struct.Struct("<QQ8s")
+
+
+class CorpusWriter:
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.offsets = array("Q", [len(MAGIC)])
+
+    def __enter__(self) -> CorpusWriter:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def write(self, ast: ASTNode):
+        self.write_bytes(lambda_codec.encode(ast))
+
+    def write_bytes(self, blob: bytes):
+        self.file.write(blob)
+        self.offsets.append(self.offsets[-1] + len(blob))
+
+    def extend(self, asts):
+        for ast in asts:
+            self.write(ast)
+
+    def close(self):
+        if self.file.closed:
+            return
+        index_offset = self.offsets[-1]
+        if sys.byteorder == "big":
+            self.offsets.byteswap()
+        self.file.write(self.offsets.tobytes())
+        self.file.write(TRAILER.pack(index_offset, len(self), INDEX_MAGIC))
+        self.file.close()
+
+
+class Corpus:
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path} is not a term corpus")
+        index_offset, count, magic = TRAILER.unpack_from(self.mm, len(self.mm) - TRAILER.size)
+        if magic != INDEX_MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path} has no index (was the writer closed?)")
+        self.count = count
+        self.index = np.frombuffer(self.mm, dtype="<u8", count=count + 1, offset=index_offset)
+
+    def __enter__(self) -> Corpus:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        # The index is a view into the map; drop it before unmapping.
+        self.index = None
+        self.mm.close()
+
+    def raw(self, i: int) -> memoryview:
+        start, end = self.span(i)
+        return memoryview(self.mm)[start:end]
+
+    def span(self, i: int) -> tuple[int, int]:
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("corpus index out of range")
+        return int(self.index[i]), int(self.index[i + 1])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self.iter_slice(i.start, i.stop, i.step or 1))
+        start, end = self.span(i)
+        return lambda_codec.decode(self.mm, start, end)
+
+    def iter_slice(self, start: int = 0, stop: int | None = None, step: int = 1):
+        start, stop, step = slice(start, stop, step).indices(self.count)
+        if step == 1:
+            offsets = self.index[start:stop + 1].tolist()
+            for a, b in zip(offsets, offsets[1:]):
+                yield lambda_codec.decode(self.mm, a, b)
+        else:
+            for i in range(start, stop, step):
+                yield self[i]
+
+    def __iter__(self):
+        return self.iter_slice()
+
+
+def write_corpus(path: str | os.PathLike, asts) -> int:
+    with CorpusWriter(path) as writer:
+        writer.extend(asts)
+        return len(writer)
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from lambda_ast import ASTNode
+from lambda_canon import binder_prefix, canonical_hash, free_variables
+
+# Weak-head evaluation by compiling terms to Python closures (higher-order
+# abstract syntax): an abstraction becomes a Python function, variables are
+# looked up in an environment tuple indexed by de Bruijn level, and
+# arguments are passed as call-by-need thunks. Reducing a redex is then a
+# closure call instead of a tree rewrite, and a compiled term can be
+# applied to many probe inputs cheaply.
+#
+# Every beta step costs one unit of fuel; running out raises OutOfFuel.
+# Closures nest as deep as the term does, so evaluation recurses in Python
+# and a RecursionError is reported as OutOfFuel as well.
+
+
+class OutOfFuel(Exception):
+    pass
+
+
+class Fuel:
+    __slots__ = ("left", "steps")
+
+    def __init__(self, amount: int):
+        self.left = amount
+        self.steps = 0
+
+
+class Fun:
+    # A weak-head normal abstraction. fn(thunk, fuel) evaluates the body.
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+
+class Neutral:
+    # A stuck application: a free variable (or probe) applied to thunks.
+    __slots__ = ("head", "args")
+
+    def __init__(self, head, args: tuple = ()):
+        self.head = head
+        self.args = args
+
+
+class Thunk:
+    __slots__ = ("code", "env", "fuel", "value")
+
+    def __init__(self, code, env, fuel):
+        self.code = code
+        self.env = env
+        self.fuel = fuel
+        self.value = None
+
+    def force(self):
+        if self.value is None:
+            self.value = self.code(self.env, self.fuel)
+            self.code = self.env = None
+        return self.value
+
+
+class Ready:
+    # An already evaluated argument, e.g. a probe input.
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def force(self):
+        return self.value
+
+
+def apply_value(f, arg, fuel: Fuel):
+    if isinstance(f, Fun):
+        if fuel.left <= 0:
+            raise OutOfFuel(f"out of fuel after {fuel.steps} steps")
+        fuel.left -= 1
+        fuel.steps += 1
+        return f.fn(arg, fuel)
+    return Neutral(f.head, f.args + (arg,))
+
+
+def _var(level: int):
+    def code(env, fuel):
+        return env[level].force()
+    return code
+
+
+def _free(name: str):
+    value = Neutral(name)
+
+    def code(env, fuel):
+        return value
+    return code
+
+
+def _abs(body):
+    def code(env, fuel):
+        return Fun(lambda arg, fuel: body(env + (arg,), fuel))
+    return code
+
+
+def _app(fn, arg):
+    def code(env, fuel):
+        return apply_value(fn(env, fuel), Thunk(arg, env, fuel), fuel)
+    return code
+
+
+def _compile(ast: ASTNode):
+    binders: dict[str, list[int]] = {}
+    level = 0
+    results = []
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        match node.left, node.right:
+            case (None, None):
+                levels = binders.get(node.value)
+                results.append(_var(levels[-1]) if levels else _free(node.value))
+            case (None, body) | (body, None):
+                if not expanded:
+                    binders.setdefault(node.value, []).append(level)
+                    level += 1
+                    stack.append((node, True))
+                    stack.append((body, False))
+                    continue
+                level -= 1
+                binders[node.value].pop()
+                results.append(_abs(results.pop()))
+            case (left, right):
+                if not expanded:
+                    stack.append((node, True))
+                    stack.append((right, False))
+                    stack.append((left, False))
+                    continue
+                arg = results.pop()
+                results.append(_app(results.pop(), arg))
+    return results.pop()
+
+
+class CompileCache:
+    # LRU of compiled closures keyed by canonical_hash, so alpha-equivalent
+    # terms share one compiled form.
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[int, object] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ast: ASTNode):
+        key = canonical_hash(ast)
+        code = self.entries.get(key)
+        if code is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return code
+        self.misses += 1
+        code = _compile(ast)
+        self.entries[key] = code
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return code
+
+
+compile_cache = CompileCache()
+
+
+def compile_term(ast: ASTNode):
+    return compile_cache.get(ast)
+
+
+def _run(thunk_fn, fuel: Fuel):
+    try:
+        return thunk_fn()
+    except RecursionError:
+        raise OutOfFuel(f"recursion limit hit after {fuel.steps} steps") from None
+
+
+def evaluate(ast: ASTNode, fuel: int | Fuel = 10000):
+    # Weak-head normal form of a closed (or open) term.
+    fuel = fuel if isinstance(fuel, Fuel) else Fuel(fuel)
+    code = compile_term(ast)
+    return _run(lambda: code((), fuel), fuel)
+
+
+def apply(ast: ASTNode, *args, fuel: int | Fuel = 10000):
+    # Weak-head normal form of `ast args...`. Arguments may be ASTNodes or
+    # values (Fun/Neutral), e.g. probe functions built in Python.
+    fuel = fuel if isinstance(fuel, Fuel) else Fuel(fuel)
+
+    def run():
+        value = compile_term(ast)((), fuel)
+        for arg in args:
+            if isinstance(arg, ASTNode):
+                arg = Thunk(compile_term(arg), (), fuel)
+            else:
+                arg = Ready(arg)
+            value = apply_value(value, arg, fuel)
+        return value
+    return _run(run, fuel)
+
+
+def reify(value, fuel: int | Fuel = 10000, prefix: str = "x") -> ASTNode:
+    # Reads a value back as an ASTNode in full normal form, evaluating under
+    # binders by applying functions to fresh variables. Binders are named
+    # prefix0, prefix1, ... by nesting level.
+    fuel = fuel if isinstance(fuel, Fuel) else Fuel(fuel)
+
+    class Fresh:
+        __slots__ = ("level",)
+
+        def __init__(self, level):
+            self.level = level
+
+    def read(value, level: int) -> ASTNode:
+        if isinstance(value, Fun):
+            var = Neutral(Fresh(level))
+            body = read(apply_value(value, Ready(var), fuel), level + 1)
+            return ASTNode(body, None).set_value(f"{prefix}{level}")
+        head = value.head
+        if isinstance(head, Fresh):
+            node = ASTNode(None, None).set_value(f"{prefix}{head.level}")
+        else:
+            node = ASTNode(None, None).set_value(str(head))
+        for arg in value.args:
+            node = ASTNode(node, read(arg.force(), level))
+        return node
+
+    return _run(lambda: read(value, 0), fuel)
+
+
+def normalize(ast: ASTNode, fuel: int = 10000) -> ASTNode:
+    budget = Fuel(fuel)
+    return reify(evaluate(ast, budget), budget, prefix=binder_prefix(free_variables(ast)))
+
+
+_SUCC = object()
+_ZERO = object()
+
+
+def church_to_int(ast: ASTNode, fuel: int = 10000) -> int | None:
+    # Decodes a Church numeral (\f.\x.f (f ... x)) by applying it to two
+    # probes; None if the term does not behave like one within the fuel.
+    budget = Fuel(fuel)
+    try:
+        value = apply(ast, Neutral(_SUCC), Neutral(_ZERO), fuel=budget)
+        n = 0
+        while isinstance(value, Neutral) and value.head is _SUCC and len(value.args) == 1:
+            n += 1
+            value = _run(value.args[0].force, budget)
+    except OutOfFuel:
+        return None
+    if isinstance(value, Neutral) and value.head is _ZERO and not value.args:
+        return n
+    return None
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import collections
+
+import numpy as np
+
+from lambda_ast import ASTNode
+from lambda_codec import ABS, APP, VAR
+
+# Terms as plain graphs. Nodes get dense ids in breadth-first order (the
+# order of ASTNode.vertices_breadth), so a node's children have consecutive
+# ids and every parent id is smaller than its children's. A batch
+# concatenates the trees; tree t owns ids offsets[t]:offsets[t + 1].
+#
+# Shape metrics are computed with array operations over the whole batch.
+# Bottom-up quantities take one vectorized step per depth level, not one
+# Python call per node.
+
+
+class TermGraph:
+    def __init__(self, kind: np.ndarray, parent: np.ndarray, depth: np.ndarray,
+                 offsets: np.ndarray, labels: list | None = None):
+        self.kind = kind
+        self.parent = parent
+        self.depth = depth
+        self.offsets = offsets
+        self.labels = labels
+        n = len(kind)
+        self.tree = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        # CSR children: BFS ids make the child lists contiguous and sorted.
+        nonroot = parent >= 0
+        self.indices = np.flatnonzero(nonroot)
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(parent[nonroot], minlength=n))])
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.kind)
+
+    def edges(self) -> np.ndarray:
+        # (E, 2) array of (parent, child) ids.
+        return np.column_stack([self.parent[self.indices], self.indices])
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def degree(self) -> np.ndarray:
+        # Undirected degree.
+        return self.out_degree() + (self.parent >= 0)
+
+    def save(self, path):
+        np.savez_compressed(path, kind=self.kind, parent=self.parent, depth=self.depth,
+                            offsets=self.offsets, indptr=self.indptr, indices=self.indices)
+
+    @classmethod
+    def load(cls, path) -> TermGraph:
+        with np.load(path) as data:
+            return cls(data["kind"], data["parent"], data["depth"], data["offsets"])
+
+
+def export_batch(asts, labels: bool = False) -> TermGraph:
+    kind = []
+    parent = []
+    depth = []
+    offsets = [0]
+    values = [] if labels else None
+    for ast in asts:
+        queue = collections.deque([(ast, -1, 0)])
+        while queue:
+            node, p, d = queue.popleft()
+            me = len(kind)
+            parent.append(p)
+            depth.append(d)
+            match node.left, node.right:
+                case (None, None):
+                    kind.append(VAR)
+                case (None, body) | (body, None):
+                    kind.append(ABS)
+                    queue.append((body, me, d + 1))
+                case (left, right):
+                    kind.append(APP)
+                    queue.append((left, me, d + 1))
+                    queue.append((right, me, d + 1))
+            if values is not None:
+                values.append(node.value)
+        offsets.append(len(kind))
+    return TermGraph(np.array(kind, dtype=np.int8), np.array(parent, dtype=np.int64),
+                     np.array(depth, dtype=np.int64), np.array(offsets, dtype=np.int64), values)
+
+
+def export(ast: ASTNode, labels: bool = False) -> TermGraph:
+    return export_batch([ast], labels)
+
+
+def _per_tree(g: TermGraph, values, reduce=np.add) -> np.ndarray:
+    out = np.zeros(g.n_trees, dtype=np.asarray(values).dtype)
+    reduce.at(out, g.tree, values)
+    return out
+
+
+def _levels(g: TermGraph):
+    # Non-root node ids grouped by depth, deepest first.
+    order = np.argsort(-g.depth, kind="stable")
+    d = g.depth[order]
+    bounds = np.flatnonzero(np.diff(d)) + 1
+    for level in np.split(order, bounds):
+        if g.depth[level[0]] > 0:
+            yield level
+
+
+def node_counts(g: TermGraph) -> np.ndarray:
+    return np.diff(g.offsets)
+
+
+def average_degree(g: TermGraph) -> np.ndarray:
+    # 2 |E| / |V|; a tree has |V| - 1 edges.
+    n = node_counts(g)
+    return np.where(n > 0, 2 * (n - 1) / np.maximum(n, 1), 0.0)
+
+
+def degree_distribution(g: TermGraph) -> np.ndarray:
+    # counts[t, k] = number of nodes of undirected degree k in tree t.
+    deg = g.degree()
+    width = int(deg.max()) + 1 if len(deg) else 1
+    return np.bincount(g.tree * width + deg, minlength=g.n_trees * width).reshape(g.n_trees, width)
+
+
+def heights(g: TermGraph) -> np.ndarray:
+    return _per_tree(g, g.depth, np.maximum)
+
+
+def level_widths(g: TermGraph) -> np.ndarray:
+    # widths[t, d] = number of nodes at depth d in tree t.
+    width = int(g.depth.max()) + 1 if g.n_nodes else 1
+    return np.bincount(g.tree * width + g.depth, minlength=g.n_trees * width).reshape(g.n_trees, width)
+
+
+def max_widths(g: TermGraph) -> np.ndarray:
+    return level_widths(g).max(axis=1)
+
+
+def subtree_leaves(g: TermGraph) -> np.ndarray:
+    leaves = (g.out_degree() == 0).astype(np.int64)
+    for level in _levels(g):
+        np.add.at(leaves, g.parent[level], leaves[level])
+    return leaves
+
+
+def subtree_heights(g: TermGraph) -> np.ndarray:
+    h = np.zeros(g.n_nodes, dtype=np.int64)
+    for level in _levels(g):
+        np.maximum.at(h, g.parent[level], h[level] + 1)
+    return h
+
+
+def sackin(g: TermGraph) -> np.ndarray:
+    # Sum of leaf depths.
+    return _per_tree(g, np.where(g.out_degree() == 0, g.depth, 0))
+
+
+def colless(g: TermGraph) -> np.ndarray:
+    # Sum over applications of |leaves(left) - leaves(right)|; abstractions
+    # are unary and contribute nothing.
+    leaves = subtree_leaves(g)
+    apps = np.flatnonzero(g.kind == APP)
+    left = g.indices[g.indptr[apps]]
+    right = g.indices[g.indptr[apps] + 1]
+    imbalance = np.zeros(g.n_nodes, dtype=np.int64)
+    imbalance[apps] = np.abs(leaves[left] - leaves[right])
+    return _per_tree(g, imbalance)
+
+
+def diameters(g: TermGraph) -> np.ndarray:
+    # Longest path in edges: through some node, down its two highest child
+    # subtrees (or down one for a unary node).
+    h = subtree_heights(g)
+    through = h.copy()
+    apps = np.flatnonzero(g.kind == APP)
+    left = g.indices[g.indptr[apps]]
+    right = g.indices[g.indptr[apps] + 1]
+    through[apps] = h[left] + h[right] + 2
+    return _per_tree(g, through, np.maximum)
+
+
+def shape_metrics(g: TermGraph) -> dict[str, np.ndarray]:
+    return {
+        "nodes": node_counts(g),
+        "average_degree": average_degree(g),
+        "height": heights(g),
+        "max_width": max_widths(g),
+        "sackin": sackin(g),
+        "colless": colless(g),
+        "diameter": diameters(g),
+    }
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from lambda_ast import ASTNode
+
+# Per-term summary numbers, computed in one explicit-stack pass. Unlike
+# ASTNode.n_applications()/n_abstractions(), the counts here are by node
+# kind: an abstraction has one child, an application two.
+
+METRIC_NAMES = (
+    "nodes",
+    "leaves",
+    "abstractions",
+    "applications",
+    "height",
+    "max_binder_depth",
+    "free_variables",
+    "closed",
+)
+
+
+def term_metrics(ast: ASTNode) -> dict:
+    leaves = abstractions = applications = 0
+    height = max_binders = 0
+    bound: dict[str, int] = {}
+    free = set()
+    stack = [(ast, 0, 0, False)]
+    while stack:
+        node, depth, binders, leaving = stack.pop()
+        if leaving:
+            bound[node.value] -= 1
+            continue
+        height = max(height, depth)
+        match node.left, node.right:
+            case (None, None):
+                leaves += 1
+                if not bound.get(node.value):
+                    free.add(node.value)
+            case (None, body) | (body, None):
+                abstractions += 1
+                max_binders = max(max_binders, binders + 1)
+                bound[node.value] = bound.get(node.value, 0) + 1
+                stack.append((node, depth, binders, True))
+                stack.append((body, depth + 1, binders + 1, False))
+            case (left, right):
+                applications += 1
+                stack.append((right, depth + 1, binders, False))
+                stack.append((left, depth + 1, binders, False))
+    return {
+        "nodes": leaves + abstractions + applications,
+        "leaves": leaves,
+        "abstractions": abstractions,
+        "applications": applications,
+        "height": height,
+        "max_binder_depth": max_binders,
+        "free_variables": len(free),
+        "closed": not free,
+    }
@@ -1,17 +1,21 @@
 from __future__ import annotations
 import re
 
-from src.lambda_ast import ASTNode
-from src.lambda_token import Token, TokenType
-
-from ete3 import Tree, TreeStyle
+import instrument
+from lambda_ast import ASTNode
+from lambda_token import Token, TokenType
 
 
 class LambdaLexer:
-    def __init__(self, input: str):
+    # Errors are collected in self.errors (the parser adds its own there
+    # too); quiet=True stops them from also being printed.
+    def __init__(self, input: str, quiet: bool = False):
         self.input = input
         self.tokens = []
         self.pos = 0
+        self.errors = []
+        self.quiet = quiet
+        clock = instrument.clock()
 
         n = 0
 
@@ -37,8 +41,18 @@ class LambdaLexer:
                         self.tokens.append(Token(TokenType.VAR, match[0]))
                         n += len(match[0])
                     else:
-                        print("lexer error")
-                        return
+                        self.error(f"unexpected {input[n]!r} at {n}", "lexer error")
+                        if instrument.enabled:
+                            instrument.count("lexer.errors")
+                        break
+        clock.lap("lexer")
+        if instrument.enabled:
+            instrument.count("lexer.tokens", len(self.tokens))
+
+    def error(self, message: str, shout: str):
+        self.errors.append(message)
+        if not self.quiet:
+            print(shout)
 
     def peek(self, n: int) -> Token:
         peek_index = self.pos + n - 1
@@ -49,7 +63,9 @@ class LambdaLexer:
     def eat(self, tok: TokenType) -> Token:
         peek = self.peek(1)
         if peek.tok_type != tok:
-            print("snytax eorrr")
+            self.error(f"expected {tok.name}, got {peek.tok_type.name}", "snytax eorrr")
+            if instrument.enabled:
+                instrument.count("parser.errors")
         self.pos += 1
         return peek
 
@@ -67,8 +83,12 @@ class LambdaParser:
 
     def parse(self) -> ASTNode:
         self.index = 0
+        clock = instrument.clock()
         expr = self.parse_term()
         self.lexer.eat(TokenType.EOF)
+        clock.lap("parser")
+        if instrument.enabled:
+            instrument.count("parser.nodes", self.index)
         self.index = 0
         return expr
 
@@ -113,10 +133,14 @@ class LambdaParser:
                 return node
             case _:
                 # "snytax rrrrrr" is a reference to Prof. Rida Bazzi
-                print("snytax rrrrrr")
+                self.lexer.error(f"expected a term, got {self.lexer.peek(1).tok_type.name}", "snytax rrrrrr")
+                if instrument.enabled:
+                    instrument.count("parser.errors")
 
 
 def main():
+    from ete3 import TreeStyle
+
     lexer = LambdaLexer(r"\ x . \ y . x y (x y)")
     parser = LambdaParser(lexer)
     ast = parser.parse()
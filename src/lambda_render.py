@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from lambda_ast import ASTNode
+
+# ete3 (and the Qt stack it renders with) is an optional extra, see
+# requirements-extras.txt. Nothing here imports it until a tree is rendered.
+
+
+def require_ete3():
+    try:
+        import ete3
+    except ImportError as e:
+        raise ImportError(
+            "rendering with ete3 needs the optional extras: "
+            "pip install -r requirements-extras.txt") from e
+    return ete3
+
+
+def my_layout(node):
+    from ete3 import AttrFace, CircleFace, faces
+
+    if node.is_leaf():
+        name_face = AttrFace("name")  # draw name for leaves
+    else:  # internal node
+        if node.name == "":
+            name_face = CircleFace(5, "red")
+        else:
+            name_face = AttrFace("name", fsize=10)  # draw label with small font
+
+    # Add the name face to the image at the preferred position
+    faces.add_face_to_node(name_face, node, column=0)
+
+
+def tree_style():
+    ete3 = require_ete3()
+    ts = ete3.TreeStyle()
+    ts.show_leaf_name = False
+    ts.layout_fn = my_layout
+    ts.show_scale = False
+    #  ts.mode = 'c'
+    #  ts.arc_start = -180 # 0 degrees = 3 o'clock
+    #  ts.arc_span = 180
+    #  ts.force_topology = True
+    return ts
+
+
+def render_ete3(ast: ASTNode, path: str, w: int = 512):
+    require_ete3()
+    t = ast.to_ete3()
+    t.render(path, tree_style=tree_style(), w=w, units='px')
+    return t
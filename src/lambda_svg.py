@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import functools
+import math
+import multiprocessing
+import os
+from xml.sax.saxutils import escape
+
+from lambda_ast import ASTNode
+import lambda_codec
+
+# Native tree drawing: a Reingold-Tilford style tidy layout computed
+# directly on ASTNode, written out as plain SVG text. No ete3/Qt needed;
+# lambda_render keeps ete3 as the optional alternative backend.
+
+X_UNIT = 28
+Y_UNIT = 36
+MARGIN = 20
+FONT_SIZE = 11
+
+
+def layout(ast: ASTNode) -> tuple[list, list[float], list[int], list[int]]:
+    # Returns (nodes, xs, ys, parents) in pre-order, x in units of one node
+    # slot, y = depth. parents[i] is -1 for the root.
+    #
+    # Each subtree keeps its contour as a list of (leftmost, rightmost) x
+    # per level, stored deepest level first plus a lazy offset, so that a
+    # parent can reuse its deeper child's list and only touch the levels
+    # the two children share.
+    rel = {}
+    contours = []
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        left, right = node.left, node.right
+        if left is not None and right is not None:
+            if not expanded:
+                stack.append((node, True))
+                stack.append((right, False))
+                stack.append((left, False))
+                continue
+            r_levels, r_off = contours.pop()
+            l_levels, l_off = contours.pop()
+            shared = min(len(l_levels), len(r_levels))
+            sep = 1.0
+            for d in range(1, shared + 1):
+                gap = (l_levels[-d][1] + l_off) - (r_levels[-d][0] + r_off) + 1.0
+                if gap > sep:
+                    sep = gap
+            half = sep / 2
+            rel[id(left)] = -half
+            rel[id(right)] = half
+            # Shift both children into the parent's frame.
+            l_off -= half
+            r_off += half
+            if len(l_levels) >= len(r_levels):
+                levels, off = l_levels, l_off
+                for d in range(1, shared + 1):
+                    lo, _ = levels[-d]
+                    levels[-d] = (lo, r_levels[-d][1] + r_off - off)
+            else:
+                levels, off = r_levels, r_off
+                for d in range(1, shared + 1):
+                    _, hi = levels[-d]
+                    levels[-d] = (l_levels[-d][0] + l_off - off, hi)
+            levels.append((-off, -off))
+            contours.append((levels, off))
+        elif left is not None or right is not None:
+            child = left if left is not None else right
+            if not expanded:
+                stack.append((node, True))
+                stack.append((child, False))
+                continue
+            rel[id(child)] = 0.0
+            levels, off = contours[-1]
+            levels.append((-off, -off))
+        else:
+            contours.append(([(0.0, 0.0)], 0.0))
+
+    nodes, xs, ys, parents = [], [], [], []
+    stack = [(ast, 0.0, 0, -1)]
+    while stack:
+        node, x, y, parent = stack.pop()
+        index = len(nodes)
+        nodes.append(node)
+        xs.append(x)
+        ys.append(y)
+        parents.append(parent)
+        for child in (node.right, node.left):
+            if child is not None:
+                stack.append((child, x + rel[id(child)], y + 1, index))
+    return nodes, xs, ys, parents
+
+
+def label(node: ASTNode) -> str:
+    match node.left, node.right:
+        case (None, None):
+            return f"{node.value}"
+        case (None, _) | (_, None):
+            return f"λ{node.value}"
+        case (_, _):
+            return ""
+
+
+def svg_body(ast: ASTNode) -> tuple[str, float, float]:
+    # SVG elements for one tree with its top-left corner at (0, 0), plus the
+    # drawing's width and height.
+    nodes, xs, ys, parents = layout(ast)
+    x_min = min(xs)
+    width = (max(xs) - x_min) * X_UNIT + 2 * MARGIN
+    height = max(ys) * Y_UNIT + 2 * MARGIN
+
+    def px(i):
+        return (xs[i] - x_min) * X_UNIT + MARGIN, ys[i] * Y_UNIT + MARGIN
+
+    parts = ['<g stroke="#555" stroke-width="1">']
+    for i, p in enumerate(parents):
+        if p >= 0:
+            x1, y1 = px(p)
+            x2, y2 = px(i)
+            parts.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}"/>')
+    parts.append('</g>')
+    parts.append(f'<g font-family="monospace" font-size="{FONT_SIZE}" text-anchor="middle">')
+    for i, node in enumerate(nodes):
+        x, y = px(i)
+        text = label(node)
+        if text:
+            parts.append(f'<rect x="{x - 3.5 * len(text) - 2:.1f}" y="{y - 7:.1f}" '
+                         f'width="{7 * len(text) + 4:.1f}" height="14" fill="white"/>')
+            parts.append(f'<text x="{x:.1f}" y="{y + 4:.1f}">{escape(text)}</text>')
+        else:
+            # Applications are drawn as the red dots main.py used with ete3.
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="5" fill="red"/>')
+    parts.append('</g>')
+    return "\n".join(parts), width, height
+
+
+def to_svg(ast: ASTNode) -> str:
+    body, width, height = svg_body(ast)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+            f'viewBox="0 0 {width:.1f} {height:.1f}">\n{body}\n</svg>\n')
+
+
+def write_svg(ast: ASTNode, path: str | os.PathLike):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(to_svg(ast))
+
+
+def _render_one(task):
+    blob, path = task
+    write_svg(lambda_codec.decode(blob), path)
+    return path
+
+
+def _cell(task, cell_w: float, cell_h: float):
+    blob, title = task
+    body, width, height = svg_body(lambda_codec.decode(blob))
+    scale = min(1.0, cell_w / width, (cell_h - 16) / height)
+    return body, width * scale, scale, title
+
+
+def _pool_map(fn, tasks, workers: int, chunksize: int):
+    if workers <= 1:
+        return [fn(task) for task in tasks]
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(fn, tasks, chunksize=chunksize)
+
+
+def render_batch(asts, out_dir: str | os.PathLike, prefix: str = "tree",
+                 workers: int | None = None) -> list[str]:
+    # One SVG file per tree. Trees travel to the workers as lambda_codec
+    # bytes, which is far cheaper than pickling nested ASTNodes.
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(lambda_codec.encode(ast), os.path.join(out_dir, f"{prefix}_{i}.svg"))
+             for i, ast in enumerate(asts)]
+    workers = workers or os.cpu_count() or 1
+    return _pool_map(_render_one, tasks, workers, max(1, len(tasks) // (4 * workers)))
+
+
+def contact_sheet(asts, path: str | os.PathLike, columns: int = 10,
+                  cell_w: float = 240, cell_h: float = 240,
+                  titles=None, workers: int | None = None):
+    # All trees on one page in a grid, each scaled down to fit its cell.
+    asts = list(asts)
+    titles = list(titles) if titles is not None else [str(i) for i in range(len(asts))]
+    tasks = [(lambda_codec.encode(ast), title) for ast, title in zip(asts, titles)]
+    workers = workers or os.cpu_count() or 1
+    cell = functools.partial(_cell, cell_w=cell_w, cell_h=cell_h)
+    cells = _pool_map(cell, tasks, workers, max(1, len(tasks) // (4 * workers)))
+
+    rows = math.ceil(len(cells) / columns) if cells else 0
+    width = columns * cell_w
+    height = rows * cell_h
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+                f'viewBox="0 0 {width:.1f} {height:.1f}">\n')
+        for i, (body, w, scale, title) in enumerate(cells):
+            x0 = (i % columns) * cell_w
+            y0 = (i // columns) * cell_h
+            f.write(f'<g transform="translate({x0:.1f},{y0:.1f})">\n')
+            f.write(f'<rect width="{cell_w:.1f}" height="{cell_h:.1f}" fill="none" stroke="#ddd"/>\n')
+            f.write(f'<text x="4" y="12" font-family="monospace" font-size="10">{escape(title)}</text>\n')
+            f.write(f'<g transform="translate({(cell_w - w) / 2:.1f},16) scale({scale:.4f})">\n')
+            f.write(body)
+            f.write('\n</g>\n</g>\n')
+        f.write('</svg>\n')
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+# Explicit-stack traversals over anything shaped like ASTNode (a `left` and
+# a `right` attribute, either of which may be None). None of these recurse,
+# so they are not bound by the interpreter's recursion limit.
+
+
+def preorder(root, prune=None):
+    # prune(node) -> True skips the children of node (node itself is still
+    # yielded).
+    stack = [root]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node = pop()
+        yield node
+        if prune is not None and prune(node):
+            continue
+        if node.right is not None:
+            push(node.right)
+        if node.left is not None:
+            push(node.left)
+
+
+def count_kinds(root) -> tuple[int, int, int]:
+    # (leaves, abstractions, applications) in a single pass.
+    leaves = abstractions = applications = 0
+    stack = [root]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node = pop()
+        left, right = node.left, node.right
+        if left is None:
+            if right is None:
+                leaves += 1
+            else:
+                abstractions += 1
+                push(right)
+        elif right is None:
+            abstractions += 1
+            push(left)
+        else:
+            applications += 1
+            push(right)
+            push(left)
+    return leaves, abstractions, applications
+
+
+def leaf_values(root) -> set:
+    return {node.value for node in preorder(root)
+            if node.left is None and node.right is None}
+
+
+def postorder(root):
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded or (node.left is None and node.right is None):
+            yield node
+            continue
+        stack.append((node, True))
+        if node.right is not None:
+            stack.append((node.right, False))
+        if node.left is not None:
+            stack.append((node.left, False))
+
+
+def inorder(root):
+    stack = []
+    node = root
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node
+        node = node.right
+
+
+def fold(root, leaf, abstraction, application, memo: dict | None = None):
+    # Bottom-up fold:
+    #   leaf(node)
+    #   abstraction(node, body)
+    #   application(node, left, right)
+    # With a memo dict, results are cached by node identity, so shared
+    # subtrees (hash-consed DAGs) are folded once. The same memo can be
+    # passed to several folds with the same callbacks.
+    results = []
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if not expanded and memo is not None:
+            hit = memo.get(id(node))
+            if hit is not None:
+                results.append(hit[1])
+                continue
+
+        left, right = node.left, node.right
+        if left is None and right is None:
+            value = leaf(node)
+        elif not expanded:
+            stack.append((node, True))
+            if right is not None:
+                stack.append((right, False))
+            if left is not None:
+                stack.append((left, False))
+            continue
+        elif left is None or right is None:
+            value = abstraction(node, results.pop())
+        else:
+            r = results.pop()
+            value = application(node, results.pop(), r)
+
+        if memo is not None:
+            # Keep the node alive so its id() cannot be reused.
+            memo[id(node)] = (node, value)
+        results.append(value)
+    return results.pop()
+
+
+def rewrite(root, fn, include_root: bool = True):
+    # In-place bottom-up rewriter. fn(node) returns a replacement node, or
+    # None to keep node. Children are rewritten before their parent is
+    # offered to fn; replacements are not traversed again. Returns the
+    # (possibly replaced) root.
+    stack = [(root, False, None, None)]
+    while stack:
+        node, expanded, parent, attr = stack.pop()
+        if not expanded and (node.left is not None or node.right is not None):
+            stack.append((node, True, parent, attr))
+            if node.right is not None:
+                stack.append((node.right, False, node, "right"))
+            if node.left is not None:
+                stack.append((node.left, False, node, "left"))
+            continue
+
+        if parent is None and not include_root:
+            continue
+        new = fn(node)
+        if new is None or new is node:
+            continue
+        if parent is None:
+            root = new
+        else:
+            setattr(parent, attr, new)
+    return root
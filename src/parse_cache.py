@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import multiprocessing
+from collections import OrderedDict
+
+import lambda_codec
+from lambda_ast import ASTNode
+from lambda_parse import LambdaLexer, LambdaParser
+
+# Stored AlChemy series repeat the same expressions over and over, so
+# parsing goes through a cache keyed by the expression string. Equal
+# strings get the *same* ASTNode back: callers must treat cached trees as
+# read-only (copy before rewriting, e.g. with lambda_codec.decode(encode())).
+#
+# The cache is bounded by entry count and by total expression length, a
+# cheap stand-in for tree size (a term has about as many nodes as
+# characters).
+
+
+def parse_checked(expr: str) -> tuple[ASTNode | None, str | None]:
+    # (tree, None), or (None, message) for input the lexer or parser
+    # rejects. Nothing is printed.
+    lexer = LambdaLexer(expr.strip(), quiet=True)
+    try:
+        ast = LambdaParser(lexer).parse()
+    except RecursionError:
+        return None, "nested too deeply"
+    except (IndexError, AttributeError) as e:
+        return None, f"{type(e).__name__}: {e}"
+    if lexer.errors:
+        return None, lexer.errors[0]
+    return ast, None
+
+
+def parse_expression(expr: str) -> ASTNode | None:
+    # None if expr is not a well-formed term; failures are cached as None.
+    return parse_checked(expr)[0]
+
+
+class ParseCache:
+    def __init__(self, maxsize: int = 100000, max_chars: int | None = 50_000_000):
+        self.maxsize = maxsize
+        self.max_chars = max_chars
+        self.entries: OrderedDict[str, ASTNode | None] = OrderedDict()
+        self.chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, expr: str) -> bool:
+        return expr in self.entries
+
+    def lookup(self, expr: str):
+        # (found, tree) without parsing on a miss.
+        try:
+            ast = self.entries[expr]
+        except KeyError:
+            return False, None
+        self.hits += 1
+        self.entries.move_to_end(expr)
+        return True, ast
+
+    def put(self, expr: str, ast: ASTNode | None):
+        if expr in self.entries:
+            self.entries.move_to_end(expr)
+            return
+        self.entries[expr] = ast
+        self.chars += len(expr)
+        while len(self.entries) > self.maxsize or \
+                (self.max_chars is not None and self.chars > self.max_chars and len(self.entries) > 1):
+            old, _ = self.entries.popitem(last=False)
+            self.chars -= len(old)
+            self.evictions += 1
+
+    def parse(self, expr: str) -> ASTNode | None:
+        found, ast = self.lookup(expr)
+        if found:
+            return ast
+        self.misses += 1
+        ast = parse_expression(expr)
+        self.put(expr, ast)
+        return ast
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "chars": self.chars,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.chars = 0
+
+
+parse_cache = ParseCache()
+
+
+def parse(expr: str) -> ASTNode | None:
+    return parse_cache.parse(expr)
+
+
+def _parse_encoded(exprs: list[str]) -> list[bytes | None]:
+    # Trees go back to the parent as codec bytes: small to pickle and no
+    # recursion on deep terms.
+    out = []
+    for expr in exprs:
+        ast = parse_expression(expr)
+        out.append(None if ast is None else lambda_codec.encode(ast))
+    return out
+
+
+def parse_column(values, cache: ParseCache | None = None, workers: int = 1,
+                 chunk_size: int = 2000) -> list[ASTNode | None]:
+    # Parses a column of expressions (list, array or pandas Series) into a
+    # list of trees in the same order. Each distinct string is parsed at
+    # most once, only if the cache does not already have it, and its rows
+    # all share the resulting tree. Every row counts as a cache lookup
+    # in the statistics.
+    cache = parse_cache if cache is None else cache
+    values = list(values)
+    distinct: dict[str, ASTNode | None] = dict.fromkeys(values)
+    missing = []
+    for expr in distinct:
+        found, ast = cache.lookup(expr)
+        if found:
+            distinct[expr] = ast
+        else:
+            missing.append(expr)
+    cache.hits += len(values) - len(distinct)
+    cache.misses += len(missing)
+
+    if workers > 1 and len(missing) > chunk_size:
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        with multiprocessing.Pool(workers) as pool:
+            encoded = [blob for part in pool.imap(_parse_encoded, chunks) for blob in part]
+        parsed = [None if blob is None else lambda_codec.decode(blob) for blob in encoded]
+    else:
+        parsed = [parse_expression(expr) for expr in missing]
+    for expr, ast in zip(missing, parsed):
+        distinct[expr] = ast
+        cache.put(expr, ast)
+    return [distinct[expr] for expr in values]
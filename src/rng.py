@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import abc
+import random as _random
+
+import numpy as np
+
+# Random number sources for the generators. Every backend offers
+#
+#   random()            float in [0, 1)
+#   randint(a, b)       integer in [a, b], both ends included
+#   permutation(n)      np.ndarray, a random permutation of range(n)
+#   seed(n)             restart the stream
+#
+# LegacyRNG is the default and draws from the global `random` and
+# `np.random` state exactly as the generators always have. The other
+# backends own their state and draw in blocks: a block of uniforms is made
+# with one NumPy call and then handed out one float at a time, so a draw
+# per node costs a list step instead of a bit-generator call.
+
+BLOCK = 4096
+
+
+class LegacyRNG:
+    name = "legacy"
+
+    def __init__(self, seed: int | None = None):
+        self.random = _random.random
+        self.randint = _random.randint
+        self.permutation = np.random.permutation
+        if seed is not None:
+            self.seed(seed)
+
+    def seed(self, n: int):
+        _random.seed(n)
+        np.random.seed(n % 2**32)
+
+    def config(self) -> dict:
+        return {"rng": self.name}
+
+
+class BlockRNG(abc.ABC):
+    name = "block"
+
+    def __init__(self, seed: int = 0, block: int = BLOCK):
+        self.block = block
+        self.seed(seed)
+
+    def seed(self, n: int):
+        self.initial_seed = n
+        self._reset(n)
+        self.random = self._stream().__next__
+
+    @abc.abstractmethod
+    def _reset(self, n: int):
+        ...
+
+    @abc.abstractmethod
+    def uniforms(self, n: int) -> np.ndarray:
+        ...
+
+    def _stream(self):
+        while True:
+            yield from self.uniforms(self.block).tolist()
+
+    def randint(self, a: int, b: int) -> int:
+        return a + int(self.random() * (b - a + 1))
+
+    def permutation(self, n: int) -> np.ndarray:
+        # Sorting uniform keys gives a uniformly random permutation.
+        return np.argsort(self.uniforms(n), kind="stable")
+
+    def config(self) -> dict:
+        # What determines the stream besides the seed.
+        return {"rng": self.name, "block": self.block}
+
+
+class MinStdRNG(BlockRNG):
+    # Park-Miller "minimal standard" Lehmer generator with the multiplier
+    # of Fontana's AlChemy: x' = A x mod M, draw x' / M. A block of n draws
+    # is x * A^i mod M for i = 1..n, with the powers of A precomputed
+    # (jump-ahead); products stay below 2^62, so int64 is exact.
+    name = "minstd"
+    A = 48271
+    M = 2147483647
+
+    def __init__(self, seed: int = 123456789, block: int = BLOCK):
+        self.powers = np.empty(0, dtype=np.int64)
+        super().__init__(seed, block)
+
+    def _reset(self, n: int):
+        self.state = n % self.M or 1
+
+    def _powers(self, n: int) -> np.ndarray:
+        if len(self.powers) < n:
+            powers = np.empty(n, dtype=np.int64)
+            powers[0] = self.A
+            step = 1
+            while step < n:
+                # A^(i + step) = A^i * A^step, doubling the filled prefix.
+                span = min(step, n - step)
+                powers[step:step + span] = powers[:span] * powers[step - 1] % self.M
+                step += span
+            self.powers = powers
+        return self.powers[:n]
+
+    def states(self, n: int) -> np.ndarray:
+        # The next n states as integers.
+        out = self._powers(n) * self.state % self.M
+        if n:
+            self.state = int(out[-1])
+        return out
+
+    def uniforms(self, n: int) -> np.ndarray:
+        return self.states(n) * (1.0 / self.M)
+
+    def jump(self, n: int):
+        # Skip n draws of the underlying stream (draws already buffered by
+        # random() are not affected).
+        self.state = self.state * pow(self.A, n, self.M) % self.M
+
+
+class NumpyRNG(BlockRNG):
+    # NumPy bit generators (PCG64, Philox, ...) behind the block interface.
+    name = "numpy"
+    bit_generator = np.random.PCG64
+
+    def _reset(self, n: int):
+        self.gen = np.random.Generator(self.bit_generator(n))
+
+    def uniforms(self, n: int) -> np.ndarray:
+        return self.gen.random(n)
+
+    def permutation(self, n: int) -> np.ndarray:
+        return self.gen.permutation(n)
+
+
+class PCG64RNG(NumpyRNG):
+    name = "pcg64"
+    bit_generator = np.random.PCG64
+
+
+class PhiloxRNG(NumpyRNG):
+    name = "philox"
+    bit_generator = np.random.Philox
+
+
+BACKENDS = {cls.name: cls for cls in (LegacyRNG, MinStdRNG, PCG64RNG, PhiloxRNG)}
+
+
+def make_rng(name: str = "legacy", seed: int | None = None):
+    cls = BACKENDS[name]
+    if seed is None:
+        return cls()
+    return cls(seed)
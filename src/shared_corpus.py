@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import functools
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from lambda_ast import ASTNode
+from lambda_codec import ABS, APP, VAR
+from stream_stats import MetricSummary
+
+# A corpus of terms laid out as flat arrays in one shared memory block, so
+# worker processes attach to it by name instead of unpickling trees.
+#
+#   kind     int8   VAR / ABS / APP (lambda_codec constants)
+#   left     int64  first child (body of an abstraction), -1 for none
+#   right    int64  second child of an application, -1 for none
+#   symbol   int32  index into the symbol table (variable or binder name),
+#                   -1 for applications
+#   offsets  int64  term t is nodes offsets[t]:offsets[t + 1], root first
+#
+# Nodes of a term are in pre-order, so children always come after their
+# parent. Symbols are stored as one utf-8 blob plus offsets.
+#
+# map_reduce hands each worker a (start, stop) range of terms and a small
+# picklable handle; only the per-range aggregates come back.
+
+ARRAYS = (("kind", np.int8), ("left", np.int64), ("right", np.int64), ("symbol", np.int32),
+          ("offsets", np.int64), ("symbol_offsets", np.int64), ("symbol_bytes", np.uint8))
+
+
+def flatten(asts):
+    kind, left, right, symbol = [], [], [], []
+    offsets = [0]
+    symbols: dict[str, int] = {}
+    for ast in asts:
+        stack = [(ast, -1, left)]
+        while stack:
+            node, parent, side = stack.pop()
+            me = len(kind)
+            if parent >= 0:
+                side[parent] = me
+            left.append(-1)
+            right.append(-1)
+            match node.left, node.right:
+                case (None, None):
+                    kind.append(VAR)
+                    symbol.append(symbols.setdefault(node.value, len(symbols)))
+                case (None, body) | (body, None):
+                    kind.append(ABS)
+                    symbol.append(symbols.setdefault(node.value, len(symbols)))
+                    stack.append((body, me, left))
+                case (l, r):
+                    kind.append(APP)
+                    symbol.append(-1)
+                    stack.append((r, me, right))
+                    stack.append((l, me, left))
+        offsets.append(len(kind))
+    encoded = [s.encode("utf-8") for s in symbols]
+    return {
+        "kind": np.array(kind, dtype=np.int8),
+        "left": np.array(left, dtype=np.int64),
+        "right": np.array(right, dtype=np.int64),
+        "symbol": np.array(symbol, dtype=np.int32),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "symbol_offsets": np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64),
+        "symbol_bytes": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+
+
+class SharedCorpus:
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict, owner: bool):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        for name, (offset, dtype, length) in layout.items():
+            setattr(self, name, np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=offset))
+        self.symbols = self._read_symbols()
+
+    def _read_symbols(self) -> list[str]:
+        raw = self.symbol_bytes.tobytes()
+        bounds = self.symbol_offsets.tolist()
+        return [raw[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+    @classmethod
+    def create(cls, asts) -> SharedCorpus:
+        arrays = flatten(asts)
+        layout = {}
+        size = 0
+        for name, dtype in ARRAYS:
+            size = -(-size // 8) * 8
+            layout[name] = (size, np.dtype(dtype).str, len(arrays[name]))
+            size += arrays[name].nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        corpus = cls(shm, layout, owner=True)
+        for name, _ in ARRAYS:
+            getattr(corpus, name)[:] = arrays[name]
+        corpus.symbols = corpus._read_symbols()
+        return corpus
+
+    @classmethod
+    def from_corpus(cls, corpus) -> SharedCorpus:
+        # From a lambda_corpus.Corpus (or any iterable of trees).
+        return cls.create(iter(corpus))
+
+    @property
+    def handle(self) -> tuple[str, dict]:
+        return self.shm.name, self.layout
+
+    @classmethod
+    def attach(cls, handle: tuple[str, dict]) -> SharedCorpus:
+        name, layout = handle
+        return cls(shared_memory.SharedMemory(name=name), layout, owner=False)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> ASTNode:
+        return self.term(i)
+
+    def node_range(self, i: int) -> tuple[int, int]:
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def term(self, i: int) -> ASTNode:
+        # Rebuilds term i; children have larger ids, so build back to front.
+        start, stop = self.node_range(i)
+        kind = self.kind[start:stop].tolist()
+        left = self.left[start:stop].tolist()
+        right = self.right[start:stop].tolist()
+        symbol = self.symbol[start:stop].tolist()
+        built: list[ASTNode | None] = [None] * (stop - start)
+        for j in range(stop - start - 1, -1, -1):
+            k = kind[j]
+            if k == VAR:
+                node = ASTNode(None, None).set_value(self.symbols[symbol[j]])
+            elif k == ABS:
+                node = ASTNode(built[left[j] - start], None).set_value(self.symbols[symbol[j]])
+            else:
+                node = ASTNode(built[left[j] - start], built[right[j] - start])
+            built[j] = node
+        return built[0]
+
+    def iter_slice(self, start: int = 0, stop: int | None = None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield self.term(i)
+
+    def close(self):
+        for name, _ in ARRAYS:
+            setattr(self, name, None)
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+    def __enter__(self) -> SharedCorpus:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+
+_attached: dict[str, SharedCorpus] = {}
+
+
+def _attached_corpus(handle) -> SharedCorpus:
+    # One attachment per worker process and block.
+    name = handle[0]
+    corpus = _attached.get(name)
+    if corpus is None:
+        corpus = _attached[name] = SharedCorpus.attach(handle)
+    return corpus
+
+
+def _run_range(task):
+    handle, fn, start, stop = task
+    return fn(_attached_corpus(handle), start, stop)
+
+
+def ranges(n: int, chunk: int):
+    return [(start, min(start + chunk, n)) for start in range(0, n, chunk)]
+
+
+def map_ranges(corpus: SharedCorpus, fn, workers: int = 1, chunk: int = 10000):
+    # fn(corpus, start, stop) for consecutive term ranges, results in order.
+    # fn must be picklable (a module-level function or a functools.partial
+    # of one).
+    spans = ranges(len(corpus), chunk)
+    if workers <= 1:
+        return [fn(corpus, start, stop) for start, stop in spans]
+    tasks = [(corpus.handle, fn, start, stop) for start, stop in spans]
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(_run_range, tasks)
+
+
+def map_reduce(corpus: SharedCorpus, fn, reduce, initial=None, workers: int = 1, chunk: int = 10000):
+    result = initial
+    for part in map_ranges(corpus, fn, workers, chunk):
+        result = part if result is None else reduce(result, part)
+    return result
+
+
+def _summarize_range(metric, corpus: SharedCorpus, start: int, stop: int) -> MetricSummary:
+    summary = MetricSummary()
+    for ast in corpus.iter_slice(start, stop):
+        summary.add(metric(ast))
+    return summary.flush()
+
+
+def summarize_metric(corpus: SharedCorpus, metric, workers: int = 1, chunk: int = 10000) -> MetricSummary:
+    # Distribution of a per-term metric (ASTNode -> number) over the corpus.
+    return map_reduce(corpus, functools.partial(_summarize_range, metric),
+                      lambda a, b: a.merge(b), workers=workers, chunk=chunk)
+
+
+def kind_counts(corpus: SharedCorpus, start: int, stop: int) -> np.ndarray:
+    # Per-term (VAR, ABS, APP) counts straight from the arrays, no trees.
+    lo, hi = int(corpus.offsets[start]), int(corpus.offsets[stop])
+    term = np.repeat(np.arange(stop - start), np.diff(corpus.offsets[start:stop + 1]))
+    kinds = corpus.kind[lo:hi].astype(np.int64)
+    return np.bincount(term * 3 + kinds, minlength=(stop - start) * 3).reshape(-1, 3)[:, [VAR, ABS, APP]]
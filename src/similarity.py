@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import argparse
+
+import numpy as np
+
+import lambda_codec
+from lambda_ast import ASTNode
+from lambda_canon import debruijn_hashes
+from lambda_parse import LambdaLexer, LambdaParser
+from parse_cache import ParseCache
+
+# Near-duplicate search over large term collections.
+#
+# A term's fingerprint is the multiset of the alpha-invariant hashes of its
+# subtrees (subtree shingles). MinHash signatures estimate the Jaccard
+# similarity of two fingerprints, and LSH banding (b bands of r rows) makes
+# terms collide in some band with probability 1 - (1 - s^r)^b, so a query
+# only looks at the buckets it falls into. The candidates are finally
+# re-ranked by exact (Zhang-Shasha) tree edit distance.
+
+U64 = np.uint64
+GOLDEN = U64(0x9E3779B97F4A7C15)
+
+
+def shingles(ast: ASTNode, min_size: int = 1) -> np.ndarray:
+    # Subtree hashes as a uint64 array; repeated subtrees are kept apart
+    # by their occurrence number, so the set semantics of MinHash see a
+    # multiset.
+    hashes = []
+    sizes = []
+
+    def emit(node, h):
+        match node.left, node.right:
+            case (None, None):
+                size = 1
+            case (None, _) | (_, None):
+                size = sizes.pop() + 1
+            case _:
+                size = sizes.pop() + sizes.pop() + 1
+        sizes.append(size)
+        if size >= min_size:
+            hashes.append(h)
+
+    debruijn_hashes(ast, emit)
+    arr = np.sort(np.array(hashes, dtype=U64))
+    if len(arr) == 0:
+        return arr
+    starts = np.flatnonzero(np.concatenate([[True], arr[1:] != arr[:-1]]))
+    runs = np.diff(np.append(starts, len(arr)))
+    rank = np.arange(len(arr)) - np.repeat(starts, runs)
+    return arr + rank.astype(U64) * GOLDEN
+
+
+class MinHash:
+    # h_i(x) = a_i * x + b_i mod 2**64 with random odd a_i; the minimum of
+    # each over a shingle set is one signature entry.
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(0, 2**63, num_perm, dtype=np.uint64) * U64(2) + U64(1)
+        self.b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        if len(shingles) == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=U64)
+        return (np.outer(shingles, self.a) + self.b).min(axis=0)
+
+    def signatures(self, shingle_sets, chunk: int = 1 << 16) -> np.ndarray:
+        # One row per set; sets are concatenated and reduced together.
+        out = np.full((len(shingle_sets), self.num_perm), np.iinfo(np.uint64).max, dtype=U64)
+        lengths = np.array([len(s) for s in shingle_sets])
+        nonempty = np.flatnonzero(lengths)
+        start = 0
+        while start < len(nonempty):
+            # Take whole sets up to about `chunk` shingles at a time.
+            total = np.cumsum(lengths[nonempty[start:]])
+            stop = start + max(1, int(np.searchsorted(total, chunk, side="right")))
+            rows = nonempty[start:stop]
+            flat = np.concatenate([shingle_sets[i] for i in rows])
+            offsets = np.concatenate([[0], np.cumsum(lengths[rows])[:-1]])
+            out[rows] = np.minimum.reduceat(np.outer(flat, self.a) + self.b, offsets, axis=0)
+            start = stop
+        return out
+
+
+def jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+
+def _postorder(ast: ASTNode):
+    # Labels and leftmost-leaf indices in post-order. Labels are
+    # alpha-invariant: bound variables by de Bruijn index, free ones by name.
+    labels = []
+    lmld = []
+    firsts = []
+    binders: dict[str, list[int]] = {}
+    level = 0
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        match node.left, node.right:
+            case (None, None):
+                levels = binders.get(node.value)
+                label = ("b", level - levels[-1] - 1) if levels else ("f", node.value)
+                first = len(labels)
+            case (None, body) | (body, None):
+                if not expanded:
+                    binders.setdefault(node.value, []).append(level)
+                    level += 1
+                    stack.append((node, True))
+                    stack.append((body, False))
+                    continue
+                level -= 1
+                binders[node.value].pop()
+                label = ("abs",)
+                first = firsts.pop()
+            case (left, right):
+                if not expanded:
+                    stack.append((node, True))
+                    stack.append((right, False))
+                    stack.append((left, False))
+                    continue
+                firsts.pop()
+                first = firsts.pop()
+                label = ("app",)
+        labels.append(label)
+        lmld.append(first)
+        firsts.append(first)
+    return labels, lmld
+
+
+def tree_edit_distance(a: ASTNode, b: ASTNode) -> int:
+    # Zhang-Shasha ordered tree edit distance with unit costs.
+    la, ma = _postorder(a)
+    lb, mb = _postorder(b)
+    n, m = len(la), len(lb)
+    keyroots_a = sorted({l: i for i, l in enumerate(ma)}.values())
+    keyroots_b = sorted({l: j for j, l in enumerate(mb)}.values())
+    td = [[0] * m for _ in range(n)]
+    for i in keyroots_a:
+        li = ma[i]
+        for j in keyroots_b:
+            lj = mb[j]
+            rows, cols = i - li + 2, j - lj + 2
+            fd = [[0] * cols for _ in range(rows)]
+            for x in range(1, rows):
+                fd[x][0] = x
+            for y in range(1, cols):
+                fd[0][y] = y
+            for x in range(1, rows):
+                ia = li + x - 1
+                fx, fx1 = fd[x], fd[x - 1]
+                for y in range(1, cols):
+                    jb = lj + y - 1
+                    best = min(fx1[y], fx[y - 1]) + 1
+                    if ma[ia] == li and mb[jb] == lj:
+                        d = min(best, fx1[y - 1] + (la[ia] != lb[jb]))
+                        td[ia][jb] = d
+                    else:
+                        d = min(best, fd[ma[ia] - li][mb[jb] - lj] + td[ia][jb])
+                    fx[y] = d
+    return td[n - 1][m - 1]
+
+
+class LSHIndex:
+    # bands * rows must equal num_perm. Terms are kept codec-encoded for
+    # the re-ranker unless keep_terms is False.
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1,
+                 min_size: int = 1, keep_terms: bool = True):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.minhash = MinHash(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_size = min_size
+        self.keep_terms = keep_terms
+        self.tables: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+        self.keys = []
+        self.signatures: list[np.ndarray] = []
+        self.terms: list[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def threshold(self) -> float:
+        # Similarity at which a pair collides with probability about 1/2.
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def _bands(self, sig: np.ndarray):
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, ast: ASTNode, key=None):
+        self.extend([ast], None if key is None else [key])
+
+    def extend(self, asts, keys=None):
+        asts = list(asts)
+        keys = list(range(len(self.keys), len(self.keys) + len(asts))) if keys is None else list(keys)
+        sigs = self.minhash.signatures([shingles(ast, self.min_size) for ast in asts])
+        for ast, key, sig in zip(asts, keys, sigs):
+            pos = len(self.keys)
+            self.keys.append(key)
+            self.signatures.append(sig)
+            if self.keep_terms:
+                self.terms.append(lambda_codec.encode(ast))
+            for table, band in zip(self.tables, self._bands(sig)):
+                table.setdefault(band, []).append(pos)
+
+    def candidates(self, sig: np.ndarray) -> set[int]:
+        found = set()
+        for table, band in zip(self.tables, self._bands(sig)):
+            found.update(table.get(band, ()))
+        return found
+
+    def query(self, ast: ASTNode, k: int = 10, rerank: bool = True,
+              max_candidates: int = 50) -> list[tuple[object, float, int | None]]:
+        # (key, estimated Jaccard, edit distance) for the k nearest
+        # candidates. Without re-ranking (or stored terms) the distance is
+        # None and candidates are ordered by estimated Jaccard only.
+        sig = self.minhash.signature(shingles(ast, self.min_size))
+        scored = sorted(((jaccard(sig, self.signatures[pos]), pos) for pos in self.candidates(sig)),
+                        key=lambda sp: (-sp[0], sp[1]))[:max_candidates]
+        if not (rerank and self.keep_terms):
+            return [(self.keys[pos], s, None) for s, pos in scored[:k]]
+        ranked = sorted(((tree_edit_distance(ast, lambda_codec.decode(self.terms[pos])), -s, pos)
+                         for s, pos in scored))
+        return [(self.keys[pos], -s, d) for d, s, pos in ranked[:k]]
+
+
+def index_db(db: str, experiment_ids=None, series=None, batch_size: int = 10000, **kwargs) -> LSHIndex:
+    # Index of the AlChemy table keyed by row id.
+    from alchemy_store import AlchemyStore
+
+    index = LSHIndex(**kwargs)
+    cache = ParseCache()
+    with AlchemyStore(db) as store:
+        batch = []
+        rows = store.iter_query(experiment_ids=experiment_ids, series=series,
+                                columns=("id", "lambda_expression"), page_size=batch_size)
+        for id, expr in rows:
+            ast = cache.parse(expr)
+            if ast is not None:
+                batch.append((id, ast))
+            if len(batch) == batch_size:
+                index.extend([a for _, a in batch], [i for i, _ in batch])
+                batch = []
+        if batch:
+            index.extend([a for _, a in batch], [i for i, _ in batch])
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find stored terms structurally similar to a term.")
+    parser.add_argument("expression")
+    parser.add_argument("--db", default="alchemy_data.db")
+    parser.add_argument("--experiment-id", type=int, action="append", default=None)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--bands", type=int, default=32)
+    parser.add_argument("--num-perm", type=int, default=128)
+    args = parser.parse_args()
+
+    index = index_db(args.db, args.experiment_id, num_perm=args.num_perm, bands=args.bands)
+    ast = LambdaParser(LambdaLexer(args.expression)).parse()
+    for key, score, distance in index.query(ast, args.k):
+        print(f"{key}\t{score:.3f}\t{distance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import argparse
+import sys
+
+import graph_reduce
+import lambda_eval
+import utils
+from lambda_eval import OutOfFuel
+from parse_cache import parse_checked
+
+# A local stand-in for an AlChemy-style evaluator: reads a script in the
+# dump_gen_in_alchemy_fmt format on stdin and prints the normal form of
+# every `eval ...;` term, one per line. Terms that do not normalize within
+# the fuel budget are dropped, as the real evaluator drops non-terminating
+# reactions. --engine graph uses graph_reduce, whose node budget keeps
+# duplicating terms from exhausting memory.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize `eval term;` lines from stdin.")
+    parser.add_argument("--fuel", type=int, default=1000)
+    parser.add_argument("--engine", choices=["closure", "graph"], default="closure")
+    parser.add_argument("--max-nodes", type=int, default=1_000_000, help="graph engine node budget")
+    args = parser.parse_args()
+
+    match args.engine:
+        case "graph":
+            def normalize(ast, fuel):
+                return graph_reduce.normalize(ast, fuel, args.max_nodes)
+        case _:
+            normalize = lambda_eval.normalize
+
+    for line in sys.stdin:
+        expr = utils.strip_alchemy_fmt(line)
+        if expr is None:
+            continue
+        ast, message = parse_checked(expr)
+        if ast is None:
+            print(f"cannot parse {expr!r}: {message}", file=sys.stderr)
+            continue
+        try:
+            result = normalize(ast, args.fuel)
+        except OutOfFuel:
+            continue
+        sys.stdout.write(result.tolambda() + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+# Bounded-memory summaries of metric streams. Everything here can be fed
+# values one at a time or as arrays, is picklable, and merges with a summary
+# of the same kind built elsewhere (e.g. in another worker process), so
+# distributions over 10^7+ trees never have to be held as Python lists.
+
+
+class RunningMoments:
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        arr = np.atleast_1d(np.asarray(values, dtype=float))
+        if len(arr) == 0:
+            return self
+        other = RunningMoments()
+        other.n = len(arr)
+        other.mean = float(arr.mean())
+        other.m2 = float(((arr - other.mean) ** 2).sum())
+        other.min = float(arr.min())
+        other.max = float(arr.max())
+        return self.merge(other)
+
+    def merge(self, other: RunningMoments) -> RunningMoments:
+        # Chan et al. pairwise update.
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class Histogram:
+    # Fixed bins over [lo, hi); values outside land in underflow/overflow.
+    def __init__(self, lo: float, hi: float, bins: int = 100):
+        self.edges = np.linspace(lo, hi, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def _bin(self, arr):
+        return np.searchsorted(self.edges, arr, side="right") - 1
+
+    def update(self, values):
+        arr = np.atleast_1d(np.asarray(values, dtype=float))
+        idx = self._bin(arr)
+        nbins = len(self.counts)
+        self.underflow += int((idx < 0).sum())
+        self.overflow += int((idx >= nbins).sum())
+        inside = idx[(idx >= 0) & (idx < nbins)]
+        self.counts += np.bincount(inside, minlength=nbins)
+        return self
+
+    def merge(self, other: Histogram) -> Histogram:
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("cannot merge histograms with different bins")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum()) + self.underflow + self.overflow
+
+
+class LogHistogram(Histogram):
+    # Log-spaced bins over [lo, hi), lo > 0. Values <= 0 are counted in
+    # `nonpositive` (and not in underflow).
+    def __init__(self, lo: float, hi: float, bins: int = 100):
+        if lo <= 0:
+            raise ValueError("LogHistogram needs lo > 0")
+        super().__init__(lo, hi, bins)
+        self.edges = np.geomspace(lo, hi, bins + 1)
+        self.nonpositive = 0
+
+    def update(self, values):
+        arr = np.atleast_1d(np.asarray(values, dtype=float))
+        positive = arr > 0
+        self.nonpositive += int((~positive).sum())
+        return super().update(arr[positive])
+
+    def merge(self, other: LogHistogram) -> LogHistogram:
+        super().merge(other)
+        self.nonpositive += other.nonpositive
+        return self
+
+    @property
+    def n(self) -> int:
+        return super().n + self.nonpositive
+
+
+class KLLSketch:
+    # KLL quantile sketch (Karnin, Lang, Liberty 2016). Level h holds items
+    # of weight 2**h; a full level is sorted and every other item (random
+    # offset) is promoted. The worst rank error over all quantiles is
+    # typically about 2 / k and stays below about 3.3 / k (0.0165 at
+    # k = 200) with high probability, independent of the stream length and
+    # of whether the sketch was fed in chunks or built by merging.
+    C = 2 / 3
+
+    def __init__(self, k: int = 200, seed: int | None = None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, h: int) -> int:
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * self.C ** depth)))
+
+    def update(self, values):
+        arr = np.atleast_1d(np.asarray(values, dtype=float))
+        self.n += len(arr)
+        self.levels[0] = np.concatenate([self.levels[0], arr])
+        self._compress()
+        return self
+
+    def merge(self, other: KLLSketch) -> KLLSketch:
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self.capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                keep = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                offset = int(self.rng.integers(2))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[offset::2]])
+                self.levels[h] = keep
+            h += 1
+
+    def weighted_items(self) -> tuple[np.ndarray, np.ndarray]:
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lvl), 2.0 ** h) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def cdf(self, x):
+        items, weights = self.weighted_items()
+        cum = np.concatenate([[0.0], np.cumsum(weights)])
+        idx = np.searchsorted(items, x, side="right")
+        return cum[idx] / cum[-1] if cum[-1] else np.zeros_like(np.asarray(x, dtype=float))
+
+    def quantile(self, q):
+        items, weights = self.weighted_items()
+        if len(items) == 0:
+            raise ValueError("empty sketch")
+        cum = np.cumsum(weights)
+        idx = np.searchsorted(cum, np.asarray(q) * cum[-1], side="left")
+        return items[np.minimum(idx, len(items) - 1)]
+
+    def histogram(self, bins: int = 100, range: tuple[float, float] | None = None):
+        # Approximate histogram of the stream, scaled to n; same return
+        # convention as np.histogram.
+        items, weights = self.weighted_items()
+        counts, edges = np.histogram(items, bins=bins, range=range, weights=weights)
+        total = weights.sum()
+        return (counts * (self.n / total) if total else counts), edges
+
+
+def _union_points(a: KLLSketch, b: KLLSketch) -> np.ndarray:
+    return np.union1d(np.concatenate(a.levels), np.concatenate(b.levels))
+
+
+def ks_distance(a: KLLSketch, b: KLLSketch) -> float:
+    # Two-sample Kolmogorov-Smirnov statistic sup |F_a - F_b| from sketches.
+    xs = _union_points(a, b)
+    if len(xs) == 0:
+        return 0.0
+    return float(np.max(np.abs(a.cdf(xs) - b.cdf(xs))))
+
+
+def wasserstein_distance(a: KLLSketch, b: KLLSketch) -> float:
+    # W1 = integral |F_a - F_b| dx, exact for the two step functions.
+    xs = _union_points(a, b)
+    if len(xs) < 2:
+        return 0.0
+    diff = np.abs(a.cdf(xs[:-1]) - b.cdf(xs[:-1]))
+    return float(np.sum(diff * np.diff(xs)))
+
+
+class MetricSummary:
+    # Moments plus a quantile sketch, and optionally a fixed histogram when
+    # the value range is known in advance. add() buffers scalars so that
+    # per-tree callers pay a list append, not a numpy call.
+    BUFFER = 4096
+
+    def __init__(self, k: int = 200, hist: Histogram | None = None, seed: int | None = None):
+        self.moments = RunningMoments()
+        self.sketch = KLLSketch(k, seed=seed)
+        self.hist = hist
+        self.buffer = []
+
+    def add(self, value: float):
+        self.buffer.append(value)
+        if len(self.buffer) >= self.BUFFER:
+            self.flush()
+
+    def update(self, values):
+        self.flush()
+        self.moments.update(values)
+        self.sketch.update(values)
+        if self.hist is not None:
+            self.hist.update(values)
+        return self
+
+    def flush(self):
+        if self.buffer:
+            values, self.buffer = self.buffer, []
+            self.update(values)
+        return self
+
+    def merge(self, other: MetricSummary) -> MetricSummary:
+        self.flush()
+        other.flush()
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        if self.hist is not None and other.hist is not None:
+            self.hist.merge(other.hist)
+        return self
+
+    def __getstate__(self):
+        self.flush()
+        return self.__dict__
+
+    @property
+    def n(self) -> int:
+        return self.moments.n + len(self.buffer)
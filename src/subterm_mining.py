@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import argparse
+import heapq
+import multiprocessing
+
+from lambda_ast import ASTNode
+from lambda_canon import canonicalize, debruijn_hashes
+from parse_cache import ParseCache, parse_column
+
+# Which subterms dominate a population. Every subterm of every term gets its
+# alpha-invariant hash in the same bottom-up pass as the term itself
+# (lambda_canon.debruijn_hashes), and the hashes feed a Space-Saving sketch
+# (Metwally et al. 2005): at most k counters, every item with frequency
+# above n / k is guaranteed to be kept, and each count overestimates by at
+# most its recorded error. Sketches built over shards merge (Agarwal et al.
+# 2012), so large corpora are mined in parallel.
+#
+# The minimum counter is found through a heap with one (count, key) entry
+# per tracked key. Increments leave entries stale (counts only grow), and a
+# stale entry is refreshed when it reaches the top, so an update costs
+# O(log k) amortized.
+
+
+class SpaceSaving:
+    def __init__(self, k: int = 1000):
+        self.k = k
+        self.n = 0
+        self.counts: dict[int, int] = {}
+        self.errors: dict[int, int] = {}
+        self.heap: list[tuple[int, int]] = []
+
+    def update(self, key: int, weight: int = 1) -> bool:
+        # True if the key entered the sketch with this update.
+        self.n += weight
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+            return False
+        if len(counts) < self.k:
+            counts[key] = weight
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (weight, key))
+            return True
+        floor, victim = self._minimum()
+        del counts[victim]
+        del self.errors[victim]
+        counts[key] = floor + weight
+        self.errors[key] = floor
+        heapq.heapreplace(self.heap, (floor + weight, key))
+        return True
+
+    def _minimum(self) -> tuple[int, int]:
+        # The top heap entry, refreshed until it is current.
+        heap = self.heap
+        counts = self.counts
+        while (count := counts[heap[0][1]]) != heap[0][0]:
+            heapq.heapreplace(heap, (count, heap[0][1]))
+        return heap[0]
+
+    def min_count(self) -> int:
+        return self._minimum()[0] if len(self.counts) >= self.k else 0
+
+    def merge(self, other: SpaceSaving) -> SpaceSaving:
+        # A key missing from a full sketch may have occurred up to its
+        # minimum count times there, which goes into both count and error.
+        a_min, b_min = self.min_count(), other.min_count()
+        counts: dict[int, int] = {}
+        errors: dict[int, int] = {}
+        for key in self.counts.keys() | other.counts.keys():
+            if key in self.counts:
+                c, e = self.counts[key], self.errors[key]
+            else:
+                c, e = a_min, a_min
+            if key in other.counts:
+                c, e = c + other.counts[key], e + other.errors[key]
+            else:
+                c, e = c + b_min, e + b_min
+            counts[key] = c
+            errors[key] = e
+        keep = sorted(counts, key=counts.get, reverse=True)[:self.k]
+        self.counts = {key: counts[key] for key in keep}
+        self.errors = {key: errors[key] for key in keep}
+        self.heap = [(c, key) for key, c in self.counts.items()]
+        heapq.heapify(self.heap)
+        self.n += other.n
+        return self
+
+    def top(self, n: int | None = None) -> list[tuple[int, int, int]]:
+        # (key, count, error), most frequent first. count - error is a lower
+        # bound on the true frequency.
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [(key, c, self.errors[key]) for key, c in ranked[:n]]
+
+
+class SubtermMiner:
+    # Counts subterm occurrences (or, with per_term, the number of terms a
+    # subterm occurs in) for subterms of at least min_size nodes. One
+    # example of each tracked subterm is kept, canonicalized when the
+    # results are read or pickled.
+    def __init__(self, k: int = 1000, min_size: int = 2, per_term: bool = False):
+        self.sketch = SpaceSaving(k)
+        self.min_size = min_size
+        self.per_term = per_term
+        self.terms = 0
+        self.examples: dict[int, ASTNode | str] = {}
+
+    def add(self, ast: ASTNode):
+        sizes = []
+        seen = set()
+        sketch = self.sketch
+        examples = self.examples
+        min_size = self.min_size
+
+        def emit(node, h):
+            match node.left, node.right:
+                case (None, None):
+                    size = 1
+                case (None, _) | (_, None):
+                    size = sizes.pop() + 1
+                case _:
+                    size = sizes.pop() + sizes.pop() + 1
+            sizes.append(size)
+            if size < min_size:
+                return
+            if self.per_term:
+                if h in seen:
+                    return
+                seen.add(h)
+            if sketch.update(h):
+                examples[h] = node
+
+        debruijn_hashes(ast, emit)
+        self.terms += 1
+        if len(examples) > 2 * sketch.k:
+            self._prune()
+
+    def update(self, asts):
+        for ast in asts:
+            self.add(ast)
+        return self
+
+    def _prune(self):
+        self.examples = {h: ex for h, ex in self.examples.items() if h in self.sketch.counts}
+
+    def _materialize(self):
+        self._prune()
+        for h, ex in self.examples.items():
+            if isinstance(ex, ASTNode):
+                self.examples[h] = canonicalize(ex).tolambda()
+
+    def merge(self, other: SubtermMiner) -> SubtermMiner:
+        self.sketch.merge(other.sketch)
+        self.terms += other.terms
+        for h, ex in other.examples.items():
+            self.examples.setdefault(h, ex)
+        self._prune()
+        return self
+
+    def top(self, n: int | None = 20) -> list[tuple[str, int, int]]:
+        # (example, count, error), most frequent first.
+        self._materialize()
+        return [(self.examples[h], c, e) for h, c, e in self.sketch.top(n)]
+
+    def __getstate__(self):
+        self._materialize()
+        return self.__dict__
+
+
+def _mine_expressions(task):
+    # Repeated expressions in a batch are parsed once and share a tree.
+    expressions, k, min_size, per_term = task
+    miner = SubtermMiner(k, min_size, per_term)
+    for ast in parse_column(expressions, ParseCache()):
+        if ast is not None:
+            miner.add(ast)
+    return miner
+
+
+def _mine_corpus_shard(task):
+    path, start, stop, k, min_size, per_term = task
+    from lambda_corpus import Corpus
+
+    with Corpus(path) as corpus:
+        return SubtermMiner(k, min_size, per_term).update(corpus.iter_slice(start, stop))
+
+
+def _merge_all(miners, k, min_size, per_term) -> SubtermMiner:
+    result = SubtermMiner(k, min_size, per_term)
+    for miner in miners:
+        result.merge(miner)
+    return result
+
+
+def _run(fn, tasks, workers: int):
+    if workers <= 1:
+        return map(fn, tasks)
+    pool = multiprocessing.Pool(workers)
+    try:
+        return list(pool.imap_unordered(fn, tasks))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def mine_expressions(expressions, k: int = 1000, min_size: int = 2, per_term: bool = False,
+                     workers: int = 1, batch_size: int = 10000) -> SubtermMiner:
+    # Expressions are text terms; each batch is parsed and mined by one
+    # worker and the shard sketches are merged.
+    def tasks():
+        batch = []
+        for expr in expressions:
+            batch.append(expr)
+            if len(batch) == batch_size:
+                yield batch, k, min_size, per_term
+                batch = []
+        if batch:
+            yield batch, k, min_size, per_term
+
+    return _merge_all(_run(_mine_expressions, tasks(), workers), k, min_size, per_term)
+
+
+def mine_corpus(path: str, k: int = 1000, min_size: int = 2, per_term: bool = False,
+                workers: int = 1, shards: int | None = None) -> SubtermMiner:
+    from lambda_corpus import Corpus
+
+    with Corpus(path) as corpus:
+        n = len(corpus)
+    shards = shards or max(workers, 1)
+    bounds = [n * i // shards for i in range(shards + 1)]
+    tasks = [(path, bounds[i], bounds[i + 1], k, min_size, per_term) for i in range(shards)]
+    return _merge_all(_run(_mine_corpus_shard, tasks, workers), k, min_size, per_term)
+
+
+def mine_db(db: str, experiment_ids=None, series=None, k: int = 1000, min_size: int = 2,
+            per_term: bool = False, workers: int = 1) -> SubtermMiner:
+    from alchemy_store import AlchemyStore
+
+    with AlchemyStore(db) as store:
+        rows = store.iter_query(experiment_ids=experiment_ids, series=series,
+                                columns=("lambda_expression",), page_size=10000)
+        return mine_expressions((expr for (expr,) in rows), k, min_size, per_term, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Most frequent subterms, up to alpha-equivalence.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", help="AlChemy SQLite database")
+    source.add_argument("--corpus", help="lambda_corpus file")
+    parser.add_argument("--experiment-id", type=int, action="append", default=None)
+    parser.add_argument("-k", type=int, default=1000, help="counters kept")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--min-size", type=int, default=2, help="smallest subterm counted, in nodes")
+    parser.add_argument("--per-term", action="store_true", help="count terms containing a subterm")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.db:
+        miner = mine_db(args.db, args.experiment_id, k=args.k, min_size=args.min_size,
+                        per_term=args.per_term, workers=args.workers)
+    else:
+        miner = mine_corpus(args.corpus, args.k, args.min_size, args.per_term, args.workers)
+    print(f"{miner.terms} terms, {miner.sketch.n} subterms counted")
+    for example, count, error in miner.top(args.top):
+        print(f"{count}\t{count - error}\t{example}")
+
+
+if __name__ == "__main__":
+    main()
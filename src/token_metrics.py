@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import collections
+import multiprocessing
+import re
+
+import numpy as np
+
+from lambda_metrics import METRIC_NAMES
+
+# term_metrics() straight from the text of a term, without building an
+# ASTNode. events() is a streaming (SAX-style) tokenizer for LambdaParser's
+# grammar; token_metrics() folds the events through a stack holding one
+# small frame per open parenthesis or abstraction body.
+#
+# LambdaParser reads `a b c` as a (b c): a term of k items has k - 1
+# applications, item i (1-based) hangs at depth i below the term, except
+# the last one at depth k - 1. A frame therefore tracks its item count, the
+# best depth among items known not to be last, and the height of the latest
+# item; the height of the term follows when the frame closes.
+
+TOKEN = re.compile(r"[()\\.]|[a-z]+\d*|\S")
+
+LAMBDA = "lambda"
+VAR = "var"
+OPEN = "open"
+CLOSE = "close"
+DOT = "dot"
+
+_KINDS = {"(": OPEN, ")": CLOSE, "\\": LAMBDA, ".": DOT}
+
+
+def events(expr: str):
+    # Yields (kind, text) for each token; raises ValueError on characters
+    # the lexer does not accept.
+    for m in TOKEN.finditer(expr):
+        text = m.group()
+        kind = _KINDS.get(text)
+        if kind is None:
+            if not "a" <= text[0] <= "z":
+                raise ValueError(f"unexpected {text!r} at {m.start()}")
+            kind = VAR
+        yield kind, text
+
+
+class _Frame:
+    __slots__ = ("paren", "binder", "items", "best", "last")
+
+    def __init__(self, paren: bool, binder: str | None = None):
+        self.paren = paren
+        self.binder = binder
+        self.items = 0
+        self.best = 0
+        self.last = 0
+
+    def height(self) -> int:
+        if self.items == 0:
+            raise ValueError("empty term")
+        if self.items == 1:
+            return self.last
+        return max(self.best, self.items - 1 + self.last)
+
+
+def token_metrics(expr: str, usage: collections.Counter | None = None) -> dict:
+    # Same keys and values as lambda_metrics.term_metrics(parse(expr)).
+    # Variable occurrences are added to `usage` if given.
+    leaves = abstractions = applications = 0
+    binders = max_binders = 0
+    bound: dict[str, int] = {}
+    free = set()
+    frames = [_Frame(paren=False)]
+    tokens = events(expr)
+
+    def start_item(frame):
+        nonlocal applications
+        if frame.items:
+            applications += 1
+            frame.best = max(frame.best, frame.items + frame.last)
+        frame.items += 1
+
+    def close_abstractions():
+        # An abstraction body extends to the end of the enclosing group.
+        nonlocal binders
+        while frames[-1].binder is not None:
+            frame = frames.pop()
+            binders -= 1
+            bound[frame.binder] -= 1
+            frames[-1].last = frame.height() + 1
+
+    for kind, text in tokens:
+        frame = frames[-1]
+        if kind == VAR:
+            start_item(frame)
+            frame.last = 0
+            leaves += 1
+            if usage is not None:
+                usage[text] += 1
+            if not bound.get(text):
+                free.add(text)
+        elif kind == LAMBDA:
+            start_item(frame)
+            binder = next(tokens, (None, None))
+            dot = next(tokens, (None, None))
+            if binder[0] != VAR or dot[0] != DOT:
+                raise ValueError(f"malformed abstraction in {expr!r}")
+            abstractions += 1
+            name = binder[1]
+            bound[name] = bound.get(name, 0) + 1
+            frames.append(_Frame(paren=False, binder=name))
+            binders += 1
+            max_binders = max(max_binders, binders)
+        elif kind == OPEN:
+            start_item(frame)
+            frames.append(_Frame(paren=True))
+        elif kind == CLOSE:
+            close_abstractions()
+            frame = frames.pop()
+            if not frame.paren:
+                raise ValueError(f"unbalanced ')' in {expr!r}")
+            frames[-1].last = frame.height()
+        else:
+            raise ValueError(f"unexpected '.' in {expr!r}")
+    close_abstractions()
+    if len(frames) != 1:
+        raise ValueError(f"unclosed '(' in {expr!r}")
+    height = frames[0].height()
+    return {
+        "nodes": leaves + abstractions + applications,
+        "leaves": leaves,
+        "abstractions": abstractions,
+        "applications": applications,
+        "height": height,
+        "max_binder_depth": max_binders,
+        "free_variables": len(free),
+        "closed": not free,
+    }
+
+
+def _chunk_metrics(values):
+    columns = {name: np.full(len(values), -1, dtype=np.int64) for name in METRIC_NAMES}
+    valid = np.zeros(len(values), dtype=bool)
+    usage = collections.Counter()
+    for i, expr in enumerate(values):
+        try:
+            row = token_metrics(expr, usage)
+        except ValueError:
+            continue
+        valid[i] = True
+        for name in METRIC_NAMES:
+            columns[name][i] = row[name]
+    return columns, valid, usage
+
+
+def column_metrics(values, workers: int = 1, chunk: int = 20000):
+    # Metrics for a column of expressions: ({metric: int64 array}, valid
+    # mask, variable usage Counter). Rows that do not scan get -1 and
+    # valid False; "closed" is 0/1.
+    values = list(values)
+    chunks = [values[i:i + chunk] for i in range(0, len(values), chunk)]
+    if workers > 1 and len(chunks) > 1:
+        with multiprocessing.Pool(workers) as pool:
+            parts = pool.map(_chunk_metrics, chunks)
+    else:
+        parts = [_chunk_metrics(c) for c in chunks]
+    usage = collections.Counter()
+    for _, _, u in parts:
+        usage.update(u)
+    if not parts:
+        return {name: np.empty(0, dtype=np.int64) for name in METRIC_NAMES}, np.empty(0, dtype=bool), usage
+    columns = {name: np.concatenate([p[0][name] for p in parts]) for name in METRIC_NAMES}
+    return columns, np.concatenate([p[1] for p in parts]), usage
+
+
+def db_metrics(db: str, experiment_ids=None, series=None, workers: int = 1):
+    # column_metrics over stored rows, plus their keys.
+    from alchemy_store import AlchemyStore
+
+    with AlchemyStore(db) as store:
+        rows = list(store.iter_query(experiment_ids=experiment_ids, series=series,
+                                     columns=("experiment_id", "series_number", "time_step",
+                                              "lambda_expression"), page_size=50000))
+    keys = np.array([row[:3] for row in rows], dtype=np.int64).reshape(-1, 3)
+    columns, valid, usage = column_metrics([row[3] for row in rows], workers)
+    return keys, columns, valid, usage
@@ -1,10 +1,30 @@
+import instrument
+
+
 def dump_gen_in_alchemy_fmt(gen, n):
     print("1\n")
+    clock = instrument.clock()
     for i in range(n):
         s = gen.random_lambda()
+        clock.lap("dump.generate")
         s = "eval " + s + ";"
         print(s)
+        clock.lap("dump.output")
 
 def dump_gen(gen, n):
+    clock = instrument.clock()
     for i in range(n):
-        print(gen.random_lambda())
+        s = gen.random_lambda()
+        clock.lap("dump.generate")
+        print(s)
+        clock.lap("dump.output")
+
+def strip_alchemy_fmt(line: str) -> str | None:
+    # Undoes dump_gen_in_alchemy_fmt framing; also accepts plain dump_gen
+    # lines. Returns None for the "1" header and blank lines.
+    line = line.strip()
+    if not line or line.isdigit():
+        return None
+    if line.startswith("eval "):
+        line = line[5:].rstrip().rstrip(";").rstrip()
+    return line or None
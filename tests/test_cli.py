@@ -0,0 +1,37 @@
+import io
+
+import pytest
+
+import cli
+
+
+def generate(capsys, *argv):
+    cli.main(["generate", "--batch-size", "100", *argv])
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.mark.parametrize("argv", [
+    ("--rng", "pcg64", "--nodes", "10"),
+    ("--rng", "minstd", "-g", "fontana"),
+    ("--rng", "legacy", "--nodes", "10"),
+])
+def test_unseeded_batches_differ(capsys, argv):
+    lines = generate(capsys, "-n", "300", *argv)
+    batches = [lines[i:i + 100] for i in range(0, 300, 100)]
+    assert len(lines) == 300
+    assert batches[0] != batches[1] != batches[2] != batches[0]
+
+
+def test_seeded_runs_repeat(capsys):
+    argv = ("-n", "200", "--rng", "pcg64", "--seed", "7")
+    first = generate(capsys, *argv)
+    assert generate(capsys, *argv) == first
+    assert first[:100] != first[100:]
+
+
+def test_parse_skips_malformed_lines(capsys, monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("x0 )\n\\x0.x0\n(\n"))
+    cli.main(["parse"])
+    captured = capsys.readouterr()
+    assert captured.out == "\\x0.x0\n"
+    assert [line.split(":")[0] for line in captured.err.splitlines()] == ["line 1", "line 3"]
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+import evaluator_pool
+from evaluator_pool import Job, run_job
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    async def __call__(self, series_number, expressions):
+        self.rows.extend((series_number, expr) for expr in expressions)
+
+
+def run(command, job, **kwargs):
+    sink = ListSink()
+    result = asyncio.run(run_job(command, job, sink, **kwargs))
+    return result, sink.rows
+
+
+def test_stand_in_normalizes_every_term():
+    job = Job(4, ["(\\x0.x0)\\x1.x1", "(\\x0.\\x1.x0)a", "x0 )"] * 200)
+    result, rows = run(evaluator_pool.STAND_IN, job, insert_batch=50, chunk=64)
+    assert result.ok
+    assert result.sent == 600
+    assert result.received == len(rows) == 400
+    assert rows[:2] == [(4, "\\x0.x0"), (4, "\\x0.a")]
+    assert any("cannot parse" in line for line in result.stderr)
+
+
+def test_early_exit(caplog):
+    caplog.set_level(logging.WARNING, logger="asyncio")
+    result, rows = run(["sh", "-c", "exit 3"], Job(0, ["x0"] * 5000), chunk=1000)
+    assert result.returncode == 3
+    assert not result.ok
+    assert rows == []
+    assert not caplog.records
+
+
+def test_timeout_keeps_results_read_so_far():
+    job = Job(1, [f"x{i}" for i in range(100)])
+    result, rows = run(["sh", "-c", "head -n 12; sleep 30"], job, timeout=1)
+    assert result.timed_out
+    assert not result.ok
+    assert [expr for _, expr in rows] == [f"x{i}" for i in range(10)]